@@ -0,0 +1,125 @@
+"""Benchmark inventory loading: the original DictReader path against the store loaders.
+
+    python3 bench.py --rows 1000000 --workers 1 2 4 > bench_output.txt
+    python3 bench.py --search 10000 100000 1000000
+
+Generates a CSV of the given size (or uses --csv) and reports the best of
+--repeat runs of each loader. With --search, it instead times the search run
+on every keystroke at each inventory size: lowercasing every table field per
+row and token, as the manager started out, against the precomputed haystacks,
+and the fuzzy search ranking the SM_SEARCH_TOP_K best matches.
+"""
+import argparse
+import array
+import csv
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import main
+
+
+def generate_csv(path: Path, rows: int) -> None:
+    types = ["core", "edge", "distribution"]
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=main.SM_DELIMITER)
+        writer.writerow(["Name", "IP", "subnet", "aliases", "comment", "type", "id", "responsible", "aix_server"])
+        for i in range(rows):
+            writer.writerow([
+                f"sw{i:07d}-lx-{types[i % 3]}", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", f"net{i % 50}",
+                f"Switch {i}; rack {i % 40}", f"row {i % 7}", types[i % 3], i, f"Team {i % 20}", f"server{i % 9}",
+            ])
+
+
+def load_dictreader(path: Path) -> list:
+    """The loader the manager started out with: one stripped dict per row."""
+    with path.open("r", newline="", encoding="utf-8") as f:
+        return [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f, delimiter=main.SM_DELIMITER)]
+
+
+def load_serial(path: Path) -> main.InventoryStore:
+    with path.open("r", newline="", encoding="utf-8") as f:
+        return main.load_inventory(f)
+
+
+def search_lower(store: main.InventoryStore, tokens: tuple) -> list:
+    """The search the manager started out with: every table field lowercased, per row and token."""
+    columns = [store.columns[field] for field in main.TABLE_FIELDS]
+    return [
+        row for row in range(len(store))
+        if any(token in column[row].lower() for token in tokens for column in columns)
+    ]
+
+
+def search_haystacks(store: main.InventoryStore, tokens: tuple) -> array.array:
+    return store.rows_containing(tokens, range(len(store)))
+
+
+def search_fuzzy(store: main.InventoryStore, tokens: tuple) -> array.array:
+    rows = store.rows_fuzzy(tokens, range(len(store)))
+    return store.rank_fuzzy(tokens, rows, main.SM_SEARCH_TOP_K)
+
+
+def best_of(repeat: int, load, *args) -> tuple[float, int]:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(load(*args))
+        times.append(time.perf_counter() - started)
+    return min(times), rows
+
+
+def run_search(sizes: list, repeat: int) -> None:
+    queries = ["s", "sw0", "sw00012", "rack 1", "10.1.2", "sw00012 rack 1"]
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = Path(tmp) / f"inventory{rows}.csv"
+            generate_csv(path, rows)
+            store = load_serial(path)
+            path.unlink()
+            started = time.perf_counter()
+            store.haystacks = []
+            store.extend_haystacks()
+            print(f"{rows} rows: haystacks built in {time.perf_counter() - started:.3f}s")
+            for query in queries:
+                tokens = tuple(query.casefold().split())
+                before, matches = best_of(repeat, search_lower, store, tokens)
+                after, _ = best_of(repeat, search_haystacks, store, tokens)
+                fuzzy, _ = best_of(repeat, search_fuzzy, store, tokens)
+                print(f"  {query!r:18} {matches:8} matches  lower() {before * 1000:9.1f}ms  "
+                      f"haystacks {after * 1000:8.1f}ms  {before / after:5.1f}x  fuzzy {fuzzy * 1000:8.1f}ms")
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--csv", type=Path, help="inventory to load instead of a generated one")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows of the generated inventory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--search", type=int, nargs="*", metavar="ROWS",
+                        help="time a keystroke's search at these inventory sizes instead (default 10k, 100k and 1M)")
+    args = parser.parse_args()
+    if args.search is not None:
+        run_search(args.search or [10_000, 100_000, 1_000_000], args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if path is None:
+            path = Path(tmp) / "inventory.csv"
+            generate_csv(path, args.rows)
+        size = path.stat().st_size
+        print(f"{path}: {size / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+        baseline, rows = best_of(args.repeat, load_dictreader, path)
+        print(f"{'DictReader':<24} {baseline:8.3f}s  {rows} rows")
+        elapsed, rows = best_of(args.repeat, load_serial, path)
+        print(f"{'load_inventory':<24} {elapsed:8.3f}s  {rows} rows  {baseline / elapsed:5.2f}x")
+        for workers in sorted(set(args.workers)):
+            elapsed, rows = best_of(args.repeat, main.load_inventory_parallel, path, workers)
+            label = f"parallel, {workers} workers"
+            print(f"{label:<24} {elapsed:8.3f}s  {rows} rows  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,9 +1,39 @@
+import array
 import asyncio
+import bisect
+import collections
+import concurrent.futures
+import contextlib
 import csv
+import ctypes
+import ctypes.util
+import dataclasses
+import functools
+import glob
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import lzma
+import mmap
+import multiprocessing
+import multiprocessing.resource_tracker
 import os
+import random
+import socket
+import sqlite3
+import struct
 import subprocess
 import logging
+import math
+import re
 import sys
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from pathlib import Path
 from textual.app import App, ComposeResult
 from textual.widgets import Static, DataTable, Input
@@ -12,6 +42,12 @@ from textual import events
 from textual.timer import Timer
 from textual.screen import Screen
 from textual.css.query import NoMatches
+from textual.worker import Worker, WorkerCancelled, WorkerFailed, get_current_worker
+
+try:
+    import zstandard  # Optional: reading zstd-compressed inventories.
+except ImportError:
+    zstandard = None
 
 # Configure logging: if SM_DEBUG is true, log debug messages to file;
 # otherwise, only warnings are printed.
@@ -30,6 +66,195 @@ else:
     )
 
 
+def env_number(name: str, default, cast=float):
+    """Read a numeric setting from the environment, falling back to the default on bad input."""
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        logging.warning(f"Ignoring invalid value for {name}: {raw!r}")
+        return default
+
+
+# Batch ping limits: maximum number of probes in flight, seconds to wait for a
+# single probe and seconds after which a whole sweep is abandoned.
+SM_PING_CONCURRENCY = max(1, env_number("SM_PING_CONCURRENCY", 64, int))
+SM_PING_TIMEOUT = max(0.1, env_number("SM_PING_TIMEOUT", 2.0))
+SM_PING_DEADLINE = max(1.0, env_number("SM_PING_DEADLINE", 120.0))
+# Minimum delay in seconds between two repaints of streamed batch output.
+BATCH_RENDER_INTERVAL = 0.1
+# Ping engine: "native" uses in-process ICMP sockets, "subprocess" forks the ping
+# binary, "auto" prefers native when the host allows opening ICMP sockets.
+SM_PING_ENGINE = os.environ.get("SM_PING_ENGINE", "auto").lower()
+
+# Batch ping mode with the native engine: "sweep" probes all targets from a single
+# paced socket, "pool" runs one native probe per target through the scheduler.
+SM_BATCH_PING_MODE = os.environ.get("SM_BATCH_PING_MODE", "sweep").lower()
+# Echo requests per second sent by a sweep.
+SM_SWEEP_RATE = max(1, env_number("SM_SWEEP_RATE", 2000, int))
+# Background reachability monitor: enabled at startup, seconds between sweeps and
+# maximum random delay in seconds added to each interval.
+SM_MONITOR = os.environ.get("SM_MONITOR", "false").lower() == "true"
+SM_MONITOR_INTERVAL = max(1.0, env_number("SM_MONITOR_INTERVAL", 60.0))
+SM_MONITOR_JITTER = max(0.0, env_number("SM_MONITOR_JITTER", 5.0))
+# Longest interval in seconds a stable host backs off to between two probes.
+SM_MONITOR_MAX_INTERVAL = max(1.0, env_number("SM_MONITOR_MAX_INTERVAL", 900.0))
+# Seconds during which a probe result is served from the cache instead of probing again.
+SM_CACHE_TTL = max(0.0, env_number("SM_CACHE_TTL", 10.0))
+# Number of RTT samples kept per switch, and whether the main table shows them as a sparkline column.
+SM_HISTORY_SIZE = max(2, env_number("SM_HISTORY_SIZE", 32, int))
+SM_SPARKLINE_COLUMN = os.environ.get("SM_SPARKLINE_COLUMN", "false").lower() == "true"
+SPARKLINE_BLOCKS = "▁▂▃▄▅▆▇█"
+SPARKLINE_LOST = "×"
+# Samples shown in the sparkline column of the main table.
+SPARKLINE_COLUMN_WIDTH = 16
+# Shortest sleep of the monitor loop, so hosts falling due together share one sweep.
+MONITOR_TICK = 0.25
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_PAYLOAD = bytes(range(48, 48 + 56))  # Same 56 byte payload size as ping.
+
+
+@dataclass
+class PingResult:
+    """Outcome of probing a single host."""
+    hostname: str
+    ip: str
+    ok: bool
+    output: str
+    sent: int = 0
+    received: int = 0
+    rtt_min: float | None = None  # Round trip times in milliseconds.
+    rtt_avg: float | None = None
+    rtt_max: float | None = None
+    error: str = ""
+    probed: bool = True  # False when no probe was sent, e.g. past a batch deadline.
+
+    @classmethod
+    def failed(cls, hostname: str, ip: str, error: str, sent: int = 0) -> "PingResult":
+        return cls(hostname, ip, False, error, sent=sent, error=error)
+
+    @classmethod
+    def skipped(cls, hostname: str, ip: str, error: str) -> "PingResult":
+        return cls(hostname, ip, False, error, error=error, probed=False)
+
+    @property
+    def loss(self) -> float:
+        """Packet loss in percent, 100 when nothing was sent."""
+        if not self.sent:
+            return 100.0
+        return 100.0 * (self.sent - self.received) / self.sent
+
+
+# Statistics lines of Linux and BSD/macOS ping output.
+PING_COUNTS_RE = re.compile(r"(\d+) packets transmitted, (\d+) (?:packets )?received")
+PING_RTT_RE = re.compile(r"min/avg/max\S* = ([\d.]+)/([\d.]+)/([\d.]+)")
+
+
+def parse_ping_output(hostname: str, ip: str, output: str, returncode: int) -> PingResult:
+    """Turn the text printed by the ping binary into a structured PingResult."""
+    result = PingResult(hostname, ip, returncode == 0, output)
+    counts = PING_COUNTS_RE.search(output)
+    if counts:
+        result.sent, result.received = int(counts.group(1)), int(counts.group(2))
+    rtt = PING_RTT_RE.search(output)
+    if rtt:
+        result.rtt_min, result.rtt_avg, result.rtt_max = (float(v) for v in rtt.groups())
+    if not result.ok:
+        lines = output.strip().splitlines()
+        result.error = "No reply" if counts else (lines[-1] if lines else f"ping exited with {returncode}")
+    return result
+
+
+class PagedDataTable(DataTable):
+    """A DataTable that only materializes the rows the user has scrolled near.
+
+    DataTable measures every cell it is given, so handing it thousands of rows at
+    once stalls the UI. Rows are added a page at a time as the cursor approaches
+    the last materialized row instead.
+    """
+    PAGE_SIZE = 200
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.source = []
+        self.format_row = None
+        self.key_of = None
+        self.rendered = 0
+
+    def show_rows(self, source, format_row, key_of=None) -> None:
+        """Replace the table contents with `source`, formatted by format_row(item) -> cells.
+
+        If given, key_of(item) provides the row key of every materialized row.
+        """
+        self.clear()
+        self.source = source
+        self.format_row = format_row
+        self.key_of = key_of
+        self.rendered = 0
+        self.load_more()
+
+    def sync_rows(self, source, changed=()) -> None:
+        """Switch to `source`, a revision of the current source, touching only the rows that differ.
+
+        Materialized rows no longer in source are removed, those with a key in
+        `changed` are reformatted and rows of source that now come before the last
+        materialized one are added. If the materialized rows changed their order
+        (e.g. in a sorted view) the materialized window is laid out again.
+        Requires key_of.
+        """
+        cursor_key = None
+        if 0 <= self.cursor_row < self.row_count:
+            cursor_key = self.ordered_rows[self.cursor_row].key.value
+        # Materialized rows far behind the window (e.g. moved there by sorting) are dropped.
+        rendered = 0
+        for index, item in enumerate(itertools.islice(source, self.rendered + self.PAGE_SIZE)):
+            if self.key_of(item) in self.rows:
+                rendered = index + 1
+        expected = [self.key_of(item) for item in itertools.islice(source, rendered)]
+        wanted = set(expected)
+        for row_key in list(self.rows):
+            if row_key.value not in wanted:
+                self.remove_row(row_key)
+        current = [row.key.value for row in self.ordered_rows]
+        if expected[:len(current)] != current:
+            self.clear()
+            current = []
+        columns = [column.key for column in self.ordered_columns]
+        for index, key in enumerate(current):
+            if key in changed:
+                for column, old, new in zip(columns, self.get_row(key), self.format_row(source[index])):
+                    if old != new:
+                        self.update_cell(key, column, new)
+        for index in range(len(current), rendered):
+            self.add_row(*self.format_row(source[index]), key=expected[index])
+        self.source = source
+        self.rendered = rendered
+        if cursor_key is not None and cursor_key in self.rows:
+            self.move_cursor(row=self.get_row_index(cursor_key))
+        self.load_more()
+        logging.debug(f"PagedDataTable synced {rendered} materialized rows of {len(source)}")
+
+    def load_more(self, row: int | None = None) -> None:
+        """Materialize rows until a page lies ahead of the cursor, or of `row` (or the source ends)."""
+        cursor = max(self.cursor_row or 0, 0) if row is None else row
+        end = min(len(self.source), max(self.rendered, cursor + self.PAGE_SIZE))
+        if end <= self.rendered:
+            return
+        for index in range(self.rendered, end):
+            item = self.source[index]
+            self.add_row(*self.format_row(item), key=self.key_of(item) if self.key_of else None)
+        logging.debug(f"PagedDataTable materialized rows {self.rendered}..{end} of {len(self.source)}")
+        self.rendered = end
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        if event.cursor_row >= self.rendered - self.PAGE_SIZE // 4:
+            self.load_more()
+
+
 class StreamingOutputScreen(Screen):
     """A modal screen that streams command output as it is produced."""
     def __init__(self, cmd: list, **kwargs):
@@ -67,126 +292,2403 @@ class StreamingOutputScreen(Screen):
             logging.debug("No output_text widget found in StreamingOutputScreen")
         try:
             while True:
-                if self._closed:
-                    logging.debug("stream_output detected close flag; breaking out of loop")
+                if self._closed:
+                    logging.debug("stream_output detected close flag; breaking out of loop")
+                    break
+                line = await proc.stdout.readline()
+                if not line:
+                    break
+                decoded = line.decode()
+                logging.debug(f"StreamingOutputScreen output line: {decoded.strip()}")
+                self.output += decoded
+                if output_widget:
+                    output_widget.update(self.output)
+        except asyncio.CancelledError:
+            logging.debug("stream_output task was cancelled")
+            proc.kill()
+            await proc.wait()  # Reap the child so it does not linger as a zombie.
+            raise
+        await proc.wait()
+        logging.debug("Subprocess finished in StreamingOutputScreen")
+    
+    async def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            logging.debug("StreamingOutputScreen received ESC key, setting close flag")
+            self._closed = True
+            self.app.call_later(self.app.pop_screen)
+            event.stop()
+    
+    async def on_unmount(self) -> None:
+        logging.debug("StreamingOutputScreen unmounting, cancelling stream task if still running")
+        if self._stream_task and not self._stream_task.done():
+            self._stream_task.cancel()
+            try:
+                await self._stream_task
+            except asyncio.CancelledError:
+                logging.debug("Stream task cancelled in on_unmount")
+        await asyncio.sleep(0.3)
+        try:
+            data_table = self.app.query(DataTable).first()
+        except Exception:
+            data_table = None
+        if data_table:
+            self.app.set_focus(data_table)
+            logging.debug("Focus successfully restored to DataTable in StreamingOutputScreen")
+        else:
+            logging.debug("No DataTable found in StreamingOutputScreen on_unmount")
+
+
+class OutputScreen(Screen):
+    """A modal screen to display immediate output (or details)."""
+    def __init__(self, output_text: str, **kwargs):
+        logging.debug(f"Initializing OutputScreen with output length: {len(output_text)}")
+        self.output_text = output_text
+        super().__init__(**kwargs)
+    
+    def compose(self) -> ComposeResult:
+        logging.debug("Composing OutputScreen widgets")
+        with Vertical(classes="modal-container"):
+            yield Static("Press ESC to close", id="modal_header", classes="modal-header")
+            yield Vertical(
+                Static(self.output_text, id="output_text", classes="modal-text"),
+                id="modal_body", classes="modal-body"
+            )
+    
+    def update_output(self, new_text: str) -> None:
+        try:
+            widget = self.query("Static#output_text").first()
+            widget.update(new_text)
+        except Exception as e:
+            logging.error(f"Failed to update output: {e}")
+    
+    def update_header(self, new_text: str) -> None:
+        try:
+            widget = self.query("Static#modal_header").first()
+            widget.update(new_text)
+        except Exception as e:
+            logging.error(f"Failed to update header: {e}")
+    
+    async def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            logging.debug("OutputScreen received ESC key, scheduling pop_screen")
+            self.app.call_later(self.app.pop_screen)
+            event.stop()
+    
+    async def on_unmount(self) -> None:
+        logging.debug("OutputScreen unmounting, restoring focus to DataTable")
+        await asyncio.sleep(0.3)
+        try:
+            data_table = self.app.query(DataTable).first()
+        except Exception:
+            data_table = None
+        if data_table:
+            self.app.set_focus(data_table)
+            logging.debug("Focus successfully restored to DataTable in OutputScreen")
+        else:
+            logging.debug("No DataTable found in OutputScreen on_unmount")
+
+
+def search_mode(value: str) -> str:
+    """A search mode setting, checked against SEARCH_MODES."""
+    mode = value.strip().lower()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"must be one of {', '.join(SEARCH_MODES)}")
+    return mode
+
+
+class SettingsScreen(Screen):
+    """A modal screen to adjust runtime settings of the application."""
+    # (attribute on the app, label, type or parser) for every editable setting.
+    SETTINGS = [
+        ("ping_concurrency", "Batch ping concurrency", int),
+        ("ping_timeout", "Ping timeout (s)", float),
+        ("ping_deadline", "Batch ping deadline (s)", float),
+        ("sweep_rate", "Sweep rate (requests/s)", int),
+        ("cache_ttl", "Result cache TTL (s)", float),
+        ("monitor_interval", "Monitor interval (s)", float),
+        ("monitor_max_interval", "Monitor max interval (s)", float),
+        ("monitor_jitter", "Monitor jitter (s)", float),
+        ("search_debounce", "Search debounce (s)", float),
+        ("search_mode", "Search mode (substring/fuzzy)", search_mode),
+        ("search_top_k", "Fuzzy search results", int),
+    ]
+
+    def compose(self) -> ComposeResult:
+        logging.debug("Composing SettingsScreen widgets")
+        with Vertical(classes="modal-container"):
+            yield Static("Press ENTER to apply a value, ESC to close", id="modal_header", classes="modal-header")
+            with Vertical(id="modal_body", classes="modal-body"):
+                for attr, label, _ in self.SETTINGS:
+                    with Horizontal(classes="setting"):
+                        yield Static(label, classes="setting-label")
+                        yield Input(str(getattr(self.app, attr)), id=f"setting-{attr}", classes="setting-input")
+
+    def apply_setting(self, widget: Input) -> None:
+        for attr, label, cast in self.SETTINGS:
+            if widget.id != f"setting-{attr}":
+                continue
+            try:
+                value = cast(widget.value)
+                numeric = not isinstance(value, str)  # Other values are checked by their parser.
+                if numeric and (value < 0 or (value == 0 and attr not in ("monitor_jitter", "cache_ttl",
+                                                                          "search_debounce"))):
+                    raise ValueError("must be positive")
+            except ValueError as e:
+                logging.debug(f"Rejected value {widget.value!r} for {attr}: {e}")
+                self.update_header(f"Invalid value for {label}: {widget.value!r}")
+                return
+            setattr(self.app, attr, value)
+            if attr in ("search_mode", "search_top_k"):
+                self.app.refresh_search()
+            logging.debug(f"Setting {attr} changed to {value}")
+            self.update_header(f"{label} set to {value}")
+            return
+
+    def update_header(self, text: str) -> None:
+        try:
+            self.query("Static#modal_header").first().update(text)
+        except NoMatches:
+            logging.debug("No modal_header widget found in SettingsScreen")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        # Stop the event so the main search box does not filter on it.
+        event.stop()
+
+    async def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            logging.debug("SettingsScreen received ESC key, scheduling pop_screen")
+            self.app.call_later(self.app.pop_screen)
+            event.stop()
+        elif event.key == "enter":
+            # Handled here so the app does not re-run the selected command.
+            if isinstance(self.focused, Input):
+                self.apply_setting(self.focused)
+            event.stop()
+
+
+class BatchJob:
+    """A running batch operation whose probes are cancelled as a unit."""
+    def __init__(self, name: str, total: int):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.worker: Worker | None = None
+        self.finished = asyncio.Event()  # Set once the job's probes are done or torn down.
+
+    @property
+    def running(self) -> bool:
+        return self.worker is not None and not self.finished.is_set() and not self.worker.is_finished
+
+    async def cancel(self) -> int:
+        """Cancel the job, wait until its probes are torn down and return how many were abandoned."""
+        if not self.running:
+            return 0
+        logging.debug(f"Cancelling {self.name} with {self.total - self.done} probes outstanding")
+        self.worker.cancel()
+        try:
+            await self.worker.wait()
+        except (WorkerCancelled, WorkerFailed):
+            pass
+        return self.total - self.done
+
+
+class PingResultsScreen(Screen):
+    """A modal screen listing batch ping results in a sortable, filterable table."""
+    # (column title, PingResult attribute) in display order.
+    COLUMNS = [
+        ("Host", "hostname"),
+        ("IP", "ip"),
+        ("Sent", "sent"),
+        ("Recv", "received"),
+        ("Loss %", "loss"),
+        ("Min ms", "rtt_min"),
+        ("Avg ms", "rtt_avg"),
+        ("Max ms", "rtt_max"),
+        ("Error", "error"),
+    ]
+
+    def __init__(self, job: BatchJob, **kwargs):
+        self.job = job
+        self.results = []  # Every result received so far, in arrival order.
+        self.rows = []     # The filtered (and possibly sorted) results shown in the table.
+        self.filter_text = ""
+        self.sort_column = None
+        self.sort_ascending = True
+        super().__init__(**kwargs)
+
+    def compose(self) -> ComposeResult:
+        logging.debug("Composing PingResultsScreen widgets")
+        with Vertical(classes="modal-container"):
+            yield Static("Running batch ping, waiting for the first replies...", id="modal_header", classes="modal-header")
+            yield Input(placeholder="Filter results...", id="results_filter")
+            yield PagedDataTable(id="results_table")
+
+    def on_mount(self) -> None:
+        table = self.query_one(PagedDataTable)
+        table.cursor_type = "row"
+        table.add_columns(*(title for title, _ in self.COLUMNS))
+        table.show_rows(self.rows, self.format_row)
+        table.focus()
+
+    @staticmethod
+    def format_row(result: PingResult) -> tuple:
+        def ms(value):
+            return "" if value is None else f"{value:.2f}"
+        return (result.hostname, result.ip, str(result.sent), str(result.received),
+                f"{result.loss:.0f}", ms(result.rtt_min), ms(result.rtt_avg), ms(result.rtt_max), result.error)
+
+    def matches(self, result: PingResult) -> bool:
+        if not self.filter_text:
+            return True
+        text = self.filter_text
+        return text in result.hostname.lower() or text in result.ip or text in result.error.lower()
+
+    def sort_key(self, result: PingResult):
+        value = getattr(result, self.COLUMNS[self.sort_column][1])
+        if isinstance(value, str):
+            return (0, value.lower())
+        # Missing numbers (no reply) sort after every measured value.
+        return (0, value) if value is not None else (1, 0)
+
+    def add_results(self, results: list) -> None:
+        """Append newly completed results, keeping the active filter and sort."""
+        self.results.extend(results)
+        matching = [result for result in results if self.matches(result)]
+        if not matching:
+            return
+        if self.sort_column is not None:
+            self.rows.extend(matching)
+            self.refresh_rows()
+        else:
+            self.rows.extend(matching)
+            self.query_one(PagedDataTable).load_more()
+
+    def refresh_rows(self) -> None:
+        rows = [result for result in self.results if self.matches(result)]
+        if self.sort_column is not None:
+            # Keep results without a value at the end in both directions.
+            rows.sort(key=self.sort_key, reverse=not self.sort_ascending)
+        self.rows = rows
+        self.query_one(PagedDataTable).show_rows(self.rows, self.format_row)
+
+    def update_header(self, new_text: str) -> None:
+        try:
+            self.query("Static#modal_header").first().update(new_text)
+        except NoMatches:
+            logging.debug("No modal_header widget found in PingResultsScreen")
+
+    def on_input_changed(self, event: Input.Changed) -> None:
+        # Stop the event so the main search box does not filter on it as well.
+        event.stop()
+        self.filter_text = event.value.lower().strip()
+        self.refresh_rows()
+
+    async def on_key(self, event: events.Key) -> None:
+        if event.key == "escape":
+            logging.debug("PingResultsScreen received ESC key, scheduling pop_screen")
+            self.app.call_later(self.app.pop_screen)
+            event.stop()
+        elif event.key == "enter":
+            event.stop()
+        elif event.key.lower().startswith("f") and event.key[1:].isdigit():
+            col_index = int(event.key[1:]) - 1
+            if 0 <= col_index < len(self.COLUMNS):
+                if self.sort_column == col_index:
+                    self.sort_ascending = not self.sort_ascending
+                else:
+                    self.sort_column = col_index
+                    self.sort_ascending = True
+                logging.debug(f"Sorting ping results by {self.COLUMNS[col_index][0]}")
+                self.refresh_rows()
+            event.stop()
+
+    async def on_unmount(self) -> None:
+        logging.debug("PingResultsScreen unmounting, cancelling batch job if still running")
+        if self.job.running:
+            abandoned = await self.job.cancel()
+            message = f"{self.job.name} cancelled: {abandoned} of {self.job.total} probes abandoned"
+            logging.info(message)
+            self.app.show_status(message)
+
+
+class BatchPingScheduler:
+    """Runs ping probes with a concurrency cap, a per-probe timeout and an overall deadline."""
+    def __init__(self, probe, concurrency: int, timeout: float, deadline: float):
+        self.probe = probe  # async callable (hostname, ip, timeout) -> PingResult
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.deadline = deadline
+
+    async def run(self, targets: list, on_result=None) -> list:
+        """Probe every (hostname, ip) target and return the results in target order.
+
+        If given, on_result(index, result) is called as soon as each probe completes.
+        """
+        results = [None] * len(targets)
+        if not targets:
+            return results
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + self.deadline
+        pending = iter(enumerate(targets))
+
+        async def worker() -> None:
+            # Workers share one iterator, so at most `concurrency` probes are in flight.
+            for index, (hostname, ip) in pending:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    result = PingResult.skipped(hostname, ip, f"Skipped: batch deadline of {self.deadline:g}s reached")
+                else:
+                    timeout = min(self.timeout, remaining)
+                    try:
+                        result = await asyncio.wait_for(self.probe(hostname, ip, timeout), timeout + 1)
+                    except asyncio.TimeoutError:
+                        result = PingResult.failed(hostname, ip, f"Timed out after {timeout:g}s")
+                    except Exception as e:
+                        logging.error(f"Ping of {ip} failed: {e}")
+                        result = PingResult.failed(hostname, ip, f"Error: {e}")
+                results[index] = result
+                if on_result:
+                    on_result(index, result)
+
+        workers = min(self.concurrency, len(targets))
+        logging.debug(f"Batch ping of {len(targets)} targets with {workers} workers")
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+
+def icmp_checksum(data: bytes) -> int:
+    """RFC 1071 internet checksum."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int) -> bytes:
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + ICMP_PAYLOAD)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + ICMP_PAYLOAD
+
+
+def open_icmp_socket() -> tuple[socket.socket, bool]:
+    """Open a non-blocking ICMP socket and return it with a flag telling whether it is raw.
+
+    Unprivileged datagram sockets (net.ipv4.ping_group_range) are preferred; raw
+    sockets need root or CAP_NET_RAW.
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        raw = False
+    except OSError as e:
+        logging.debug(f"ICMP datagram socket unavailable ({e}); trying raw socket")
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        raw = True
+    sock.setblocking(False)
+    return sock, raw
+
+
+@functools.lru_cache(maxsize=None)
+def native_icmp_available() -> bool:
+    try:
+        sock, raw = open_icmp_socket()
+    except OSError as e:
+        logging.debug(f"Native ICMP engine unavailable: {e}")
+        return False
+    sock.close()
+    logging.debug(f"Native ICMP engine available using {'raw' if raw else 'datagram'} sockets")
+    return True
+
+
+class IcmpSocket:
+    """An ICMP echo socket serviced by the asyncio event loop.
+
+    Replies are matched to outstanding requests by (identifier, sequence number).
+    """
+    def __init__(self):
+        self.sock, self.raw = open_icmp_socket()
+        # Linux assigns the identifier of datagram sockets and only hands us our
+        # own replies; elsewhere the random identifier tells our replies apart.
+        self.ident = random.getrandbits(16)
+        self._seq = 0
+        self._pending = {}  # (ident, seq) -> (ip, sent_at, future)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    def next_seq(self) -> int:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return self._seq
+
+    def _on_readable(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logging.debug(f"ICMP receive failed: {e}")
+                return
+            received_at = time.perf_counter()
+            reply = self.parse_reply(data)
+            if reply is not None:
+                self.handle_reply(reply[0], reply[1], addr[0], received_at)
+
+    def parse_reply(self, data: bytes) -> tuple[int, int] | None:
+        """Return (ident, seq) of an echo reply, or None for any other packet."""
+        # Raw sockets, and datagram ones on macOS, deliver the IP (v4) header first
+        # and keep the identifier we sent; Linux datagram sockets rewrite it.
+        header = bool(data) and data[0] >> 4 == 4
+        if header:
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < 8:
+            return None
+        icmp_type, _, _, ident, seq = struct.unpack_from("!BBHHH", data)
+        if icmp_type != ICMP_ECHO_REPLY:
+            return None
+        return (ident if header else self.ident), seq
+
+    def handle_reply(self, ident: int, seq: int, source: str, received_at: float) -> None:
+        entry = self._pending.get((ident, seq))
+        if entry is None or entry[0] != source:
+            return
+        del self._pending[(ident, seq)]
+        _, sent_at, future = entry
+        if not future.done():
+            future.set_result((received_at - sent_at) * 1000.0)
+
+    async def sendto(self, packet: bytes, address: str) -> None:
+        """Send a packet, waiting for room in the socket buffer while it is full."""
+        while True:
+            try:
+                self.sock.sendto(packet, (address, 0))
+                return
+            except BlockingIOError:
+                # Like loop.sock_sendto, which needs Python 3.11.
+                writable = self._loop.create_future()
+                self._loop.add_writer(self.sock.fileno(), lambda: writable.done() or writable.set_result(None))
+                try:
+                    await writable
+                finally:
+                    self._loop.remove_writer(self.sock.fileno())
+
+    async def echo(self, ip: str, timeout: float) -> float | None:
+        """Send one echo request and return the round trip time in ms, or None on timeout."""
+        seq = self.next_seq()
+        key = (self.ident, seq)
+        future = self._loop.create_future()
+        self._pending[key] = (ip, time.perf_counter(), future)
+        try:
+            await self.sendto(build_echo_request(self.ident, seq), ip)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending.pop(key, None)
+
+    def close(self) -> None:
+        self._loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for _, _, future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+
+def summarize_rtts(hostname: str, ip: str, sent: int, rtts: list) -> PingResult:
+    """Build a PingResult (with ping-like summary text) from the collected round trip times."""
+    result = PingResult(hostname, ip, bool(rtts), "", sent=sent, received=len(rtts), error="" if rtts else "No reply")
+    lines = [f"--- {ip} ping statistics ---",
+             f"{sent} packets transmitted, {len(rtts)} received, {result.loss:.0f}% packet loss"]
+    if rtts:
+        result.rtt_min, result.rtt_max = min(rtts), max(rtts)
+        result.rtt_avg = sum(rtts) / len(rtts)
+        lines.append(f"rtt min/avg/max = {result.rtt_min:.3f}/{result.rtt_avg:.3f}/{result.rtt_max:.3f} ms")
+    result.output = "\n".join(lines)
+    return result
+
+
+async def resolve_ipv4(host: str) -> str:
+    try:
+        socket.inet_aton(host)
+        return host
+    except OSError:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None, family=socket.AF_INET)
+        return infos[0][4][0]
+
+
+async def native_ping(hostname: str, ip: str, count: int = 1, timeout: float = SM_PING_TIMEOUT,
+                      interval: float = 1.0, on_reply=None) -> PingResult:
+    """Ping a host with in-process ICMP echo requests.
+
+    If given, on_reply(seq, rtt_ms_or_None) is called after every request.
+    """
+    try:
+        address = await resolve_ipv4(ip)
+    except OSError as e:
+        return PingResult.failed(hostname, ip, f"Error: cannot resolve {ip}: {e}")
+    icmp = IcmpSocket()
+    rtts = []
+    sent = 0
+    try:
+        for seq in range(1, count + 1):
+            rtt = await icmp.echo(address, timeout)
+            sent += 1
+            if rtt is not None:
+                rtts.append(rtt)
+            if on_reply:
+                on_reply(seq, rtt)
+            if seq < count:
+                await asyncio.sleep(max(0.0, interval - (rtt or timeout * 1000.0) / 1000.0))
+    except OSError as e:
+        return PingResult.failed(hostname, ip, f"Error: {e}", sent=sent)
+    finally:
+        icmp.close()
+    return summarize_rtts(hostname, ip, count, rtts)
+
+
+class IcmpSweep(IcmpSocket):
+    """Probes many targets from one socket, fping style.
+
+    Sends are paced at `rate` requests per second and replies are matched to
+    their target through a hash table keyed by (identifier, sequence number).
+    Only requests still in flight are kept, so memory stays flat however many
+    targets are swept.
+    """
+    def __init__(self, targets: list, timeout: float, rate: int, on_result=None):
+        super().__init__()
+        try:
+            # Room for a burst of replies (and, on raw sockets, our own looped-back requests).
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        except OSError as e:
+            logging.debug(f"Could not enlarge ICMP receive buffer: {e}")
+        self.targets = targets  # (hostname, ip) tuples
+        self.timeout = timeout
+        # Keep the number of requests in flight below the 16 bit sequence space.
+        self.rate = max(1, min(int(rate), int(60000 / max(timeout, 0.001))))
+        self.on_result = on_result
+        self.results = [None] * len(targets)
+        self._inflight = {}  # (ident, seq) -> (target index, address, sent_at)
+        self._expiry = collections.deque()  # (expires_at, key), in send order
+
+    def handle_reply(self, ident: int, seq: int, source: str, received_at: float) -> None:
+        entry = self._inflight.get((ident, seq))
+        if entry is None or entry[1] != source:
+            return
+        del self._inflight[(ident, seq)]
+        self.finish(entry[0], [(received_at - entry[2]) * 1000.0])
+
+    def finish(self, index: int, rtts: list, error: str | None = None, probed: bool = True) -> None:
+        hostname, ip = self.targets[index]
+        if error is None:
+            result = summarize_rtts(hostname, ip, 1, rtts)
+        elif probed:
+            result = PingResult.failed(hostname, ip, error)
+        else:
+            result = PingResult.skipped(hostname, ip, error)
+        self.results[index] = result
+        if self.on_result:
+            self.on_result(index, result)
+
+    def expire(self, now: float) -> None:
+        # Requests are sent in order with the same timeout, so the oldest expire first.
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key = self._expiry.popleft()
+            entry = self._inflight.pop(key, None)
+            if entry is not None:
+                self.finish(entry[0], [])
+
+    async def send(self, index: int) -> None:
+        hostname, ip = self.targets[index]
+        try:
+            address = await resolve_ipv4(ip)
+        except OSError as e:
+            self.finish(index, [], f"Error: cannot resolve {ip}: {e}")
+            return
+        seq = self.next_seq()
+        key = (self.ident, seq)
+        packet = build_echo_request(self.ident, seq)
+        sent_at = time.perf_counter()
+        self._inflight[key] = (index, address, sent_at)
+        self._expiry.append((sent_at + self.timeout, key))
+        try:
+            await self.sendto(packet, address)
+        except OSError as e:
+            del self._inflight[key]
+            self.finish(index, [], f"Error: {e}")
+
+    async def run(self, deadline: float) -> list:
+        """Sweep all targets and return their results in target order."""
+        start = time.perf_counter()
+        deadline_at = start + deadline
+        sent = 0
+        while sent < len(self.targets):
+            now = time.perf_counter()
+            if now >= deadline_at:
+                break
+            # Send the burst that the rate allows since the sweep started, then yield.
+            allowed = min(len(self.targets), int((now - start) * self.rate) + 1)
+            while sent < allowed:
+                await self.send(sent)
+                sent += 1
+            self.expire(time.perf_counter())
+            await asyncio.sleep(0.001)
+        for index in range(sent, len(self.targets)):
+            self.finish(index, [], f"Skipped: batch deadline of {deadline:g}s reached", probed=False)
+        while self._inflight:
+            now = time.perf_counter()
+            if now >= deadline_at:
+                self.expire(float("inf"))
+                break
+            self.expire(now)
+            await asyncio.sleep(0.005)
+        logging.debug(f"Sweep of {len(self.targets)} targets took {time.perf_counter() - start:.3f}s")
+        return self.results
+
+
+async def icmp_sweep(targets: list, timeout: float, rate: int, deadline: float, on_result=None) -> list:
+    sweep = IcmpSweep(targets, timeout, rate, on_result)
+    try:
+        return await sweep.run(deadline)
+    finally:
+        sweep.close()
+
+
+class IcmpPingScreen(StreamingOutputScreen):
+    """A streaming screen that pings a host with the native ICMP engine."""
+    def __init__(self, hostname: str, ip: str, count: int = 4, timeout: float = SM_PING_TIMEOUT, **kwargs):
+        self.hostname = hostname
+        self.ip = ip
+        self.count = count
+        self.timeout = timeout
+        super().__init__(["native-ping", "-c", str(count), ip], **kwargs)
+
+    async def stream_output(self) -> None:
+        try:
+            output_widget = self.query("Static#output_text").first()
+        except Exception:
+            output_widget = None
+            logging.debug("No output_text widget found in IcmpPingScreen")
+
+        def append(text: str) -> None:
+            self.output += text
+            if output_widget and not self._closed:
+                output_widget.update(self.output)
+
+        def on_reply(seq: int, rtt: float | None) -> None:
+            self.app.latency_history.add(self.ip, rtt)
+            if rtt is None:
+                append(f"No reply from {self.ip}: icmp_seq={seq} (timeout {self.timeout:g}s)\n")
+            else:
+                append(f"Reply from {self.ip}: icmp_seq={seq} time={rtt:.3f} ms\n")
+
+        append(f"PING {self.hostname} ({self.ip}) with native ICMP echo requests\n")
+        result = await native_ping(self.hostname, self.ip, self.count, self.timeout, on_reply=on_reply)
+        append("\n" + result.output + "\n")
+        logging.debug("Native ping finished in IcmpPingScreen")
+
+
+class AdaptiveProbeScheduler:
+    """Decides when each monitored host is probed next.
+
+    Hosts are kept in a heap ordered by due time. Hosts that are down or whose
+    state just changed are probed every min_interval; every further unchanged
+    "up" result doubles the interval of a host, up to max_interval.
+    """
+    def __init__(self, min_interval: float, max_interval: float, jitter: float):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.jitter = jitter
+        self._heap = []   # (due, ip); exactly one entry per host that is not being probed
+        self._queued = set()  # IPs with an entry in the heap, including removed hosts
+        self._hosts = {}  # ip -> [hostname, interval, last_ok]
+
+    def sync(self, targets: dict, now: float) -> None:
+        """Track exactly the {ip: hostname} targets; new hosts are due immediately."""
+        for ip in list(self._hosts):
+            if ip not in targets:
+                del self._hosts[ip]  # Its heap entry is dropped lazily in due().
+        for ip, hostname in targets.items():
+            if ip in self._hosts:
+                self._hosts[ip][0] = hostname
+            else:
+                self._hosts[ip] = [hostname, self.min_interval, None]
+                self.schedule(ip, now)
+
+    def schedule(self, ip: str, due: float) -> None:
+        """Queue a probe of ip, unless one is queued already (e.g. from before it was removed)."""
+        if ip in self._queued:
+            return
+        self._queued.add(ip)
+        heapq.heappush(self._heap, (due, ip))
+
+    def due(self, now: float) -> list:
+        """Pop and return the (hostname, ip) targets whose probe is due."""
+        targets = []
+        while self._heap and self._heap[0][0] <= now:
+            _, ip = heapq.heappop(self._heap)
+            self._queued.discard(ip)
+            host = self._hosts.get(ip)
+            if host is not None:
+                targets.append((host[0], ip))
+        return targets
+
+    def next_due(self) -> float | None:
+        return self._heap[0][0] if self._heap else None
+
+    def report(self, result: PingResult, now: float) -> None:
+        """Reschedule a probed host according to its result."""
+        host = self._hosts.get(result.ip)
+        if host is None:
+            return
+        if not result.probed:
+            # Skipped, e.g. past the batch deadline: try again soon, knowing no more than before.
+            self.schedule(result.ip, now + self.min_interval)
+            return
+        if result.ok and host[2] is True:
+            host[1] = min(host[1] * 2, self.max_interval)
+        else:
+            host[1] = self.min_interval
+        host[2] = result.ok
+        self.schedule(result.ip, now + host[1] + random.uniform(0, self.jitter))
+
+
+class ProbeCache:
+    """The latest probe result of every IP, served as an answer while younger than `ttl` seconds."""
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # ip -> (monotonic time of the probe, PingResult)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, result: PingResult) -> None:
+        self._entries[result.ip] = (time.monotonic(), result)
+
+    def get(self, ip: str) -> PingResult | None:
+        """A fresh result for the IP, or None when it has to be probed again."""
+        entry = self._entries.get(ip)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def latest(self, ip: str) -> PingResult | None:
+        """The last known result for the IP, however old. Does not count as a lookup."""
+        entry = self._entries.get(ip)
+        return entry[1] if entry else None
+
+    def age(self, ip: str) -> float | None:
+        entry = self._entries.get(ip)
+        return time.monotonic() - entry[0] if entry else None
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0%} hit rate), {len(self)} entries, TTL {self.ttl:g}s"
+
+
+class LatencyHistory:
+    """The last `capacity` RTT samples of every host, kept in flat arrays.
+
+    Each host owns a fixed slot of `capacity` floats in one shared array('f');
+    lost probes are stored as NaN. No Python object is kept per sample, so the
+    footprint is about 4 bytes per sample plus one dict entry per host.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._slots = {}              # ip -> slot number
+        self._samples = array.array("f")
+        self._heads = array.array("I")   # Next write position inside each slot.
+        self._counts = array.array("I")  # Samples stored in each slot, at most capacity.
+        self._empty_slot = array.array("f", [math.nan]) * capacity
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, ip: str, rtt: float | None) -> None:
+        """Append a sample (None for a lost probe), overwriting the oldest one when full."""
+        slot = self._slots.get(ip)
+        if slot is None:
+            slot = self._slots[ip] = len(self._slots)
+            self._samples.extend(self._empty_slot)
+            self._heads.append(0)
+            self._counts.append(0)
+        head = self._heads[slot]
+        self._samples[slot * self.capacity + head] = math.nan if rtt is None else rtt
+        self._heads[slot] = (head + 1) % self.capacity
+        if self._counts[slot] < self.capacity:
+            self._counts[slot] += 1
+
+    def samples(self, ip: str) -> list:
+        """Samples of a host, oldest first, with NaN for lost probes."""
+        slot = self._slots.get(ip)
+        if slot is None:
+            return []
+        base, count = slot * self.capacity, self._counts[slot]
+        start = (self._heads[slot] - count) % self.capacity
+        return [self._samples[base + (start + i) % self.capacity] for i in range(count)]
+
+    def sparkline(self, ip: str, width: int | None = None) -> str:
+        samples = self.samples(ip)
+        if width is not None:
+            samples = samples[-width:]
+        measured = [rtt for rtt in samples if not math.isnan(rtt)]
+        if not measured:
+            return SPARKLINE_LOST * len(samples)
+        low, high = min(measured), max(measured)
+        scale = (len(SPARKLINE_BLOCKS) - 1) / (high - low) if high > low else 0
+        return "".join(
+            SPARKLINE_LOST if math.isnan(rtt) else SPARKLINE_BLOCKS[int((rtt - low) * scale)]
+            for rtt in samples
+        )
+
+    def describe(self, ip: str) -> str:
+        """Sparkline plus summary statistics, for the details screen."""
+        samples = self.samples(ip)
+        if not samples:
+            return "no samples yet"
+        measured = [rtt for rtt in samples if not math.isnan(rtt)]
+        summary = f"{len(samples) - len(measured)}/{len(samples)} lost"
+        if measured:
+            summary += f", min/avg/max = {min(measured):.2f}/{sum(measured) / len(measured):.2f}/{max(measured):.2f} ms"
+        return f"{self.sparkline(ip)}  ({summary})"
+
+
+def format_status(result: PingResult | None) -> tuple[str, str]:
+    """Cells of the status and RTT columns for the latest result of a host."""
+    if result is None:
+        return "", ""
+    rtt = "" if result.rtt_avg is None else f"{result.rtt_avg:.1f} ms"
+    return ("up" if result.ok else "down"), rtt
+
+
+def launch_external_ssh(ip: str):
+    username = os.environ.get("SM_USER", "")
+    if sys.platform.startswith("darwin"):
+        script = f'''
+        tell application "Terminal"
+            do script "ssh {username}@{ip}"
+            activate
+        end tell
+        '''
+        subprocess.Popen(["osascript", "-e", script])
+    elif sys.platform.startswith("linux"):
+        subprocess.Popen(["xterm", "-e", "-fa", "DejaVuSansMono", "ssh", f"{username}@{ip}"])
+    elif sys.platform.startswith("win"):
+        subprocess.Popen(["start", "cmd", "/k", f"ssh {username}@{ip}"], shell=True)
+    else:
+        raise NotImplementedError("Platform not supported")
+
+
+# Canonical inventory fields, in CSV column order.
+RECORD_FIELDS = ("name", "ip", "subnet", "aliases", "comment", "type", "id", "responsible", "aix_server")
+# Fields shown in the main table (and sorted with F1-F5), in column order.
+TABLE_FIELDS = ("name", "ip", "subnet", "aliases", "comment")
+# Joins the table fields in a row's search haystack; no search token contains it.
+HAYSTACK_SEPARATOR = "\x00"
+# Fields with a few dozen distinct values across the whole inventory, stored dictionary-encoded.
+CATEGORICAL_FIELDS = ("subnet", "comment", "type", "responsible", "aix_server", "source")
+# Rows parsed before the first paint, and per chunk afterwards, when loading the CSV.
+LOAD_FIRST_CHUNK = 200
+LOAD_CHUNK = 20000
+# Processes parsing a large CSV in parallel, and the size from which a CSV counts as large.
+SM_LOAD_WORKERS = max(1, env_number("SM_LOAD_WORKERS", os.cpu_count() or 1, int))
+PARALLEL_LOAD_MIN_BYTES = 8 << 20
+# Bytes per range handed to a parse process; the first one is small so the table fills quickly.
+PARALLEL_FIRST_RANGE = 64 << 10
+PARALLEL_RANGE = 4 << 20
+# Keep a binary snapshot of the parsed inventory next to the CSV, so unchanged files load without parsing.
+SM_SNAPSHOT = os.environ.get("SM_SNAPSHOT", "true").lower() == "true"
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_MAGIC = b"SMSNAP01"
+# With several CSV sources, which row wins when sources share a name (or IP): the one from
+# the "first" or "last" source listed, or "all" keeps every row.
+DUPLICATE_MODES = ("first", "last", "all")
+SM_DUPLICATES = os.environ.get("SM_DUPLICATES", "first").lower()
+if SM_DUPLICATES not in DUPLICATE_MODES:
+    logging.warning(f"Ignoring invalid value for SM_DUPLICATES: {SM_DUPLICATES!r}")
+    SM_DUPLICATES = "first"
+# Reload the inventory when the CSV changes: watched with inotify where available,
+# otherwise its stat is polled every SM_WATCH_INTERVAL seconds.
+SM_WATCH = os.environ.get("SM_WATCH", "true").lower() == "true"
+SM_WATCH_INTERVAL = max(0.1, env_number("SM_WATCH_INTERVAL", 2.0))
+# Seconds without further changes before a changed CSV counts as completely written.
+WATCH_SETTLE = 0.2
+# inotify events on the CSV's directory that may mean the CSV changed: written, replaced or removed.
+IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x8, 0x40, 0x80, 0x100, 0x200
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# Inventory backend: "memory" holds the columns in Python, "sqlite" imports the CSV into an
+# indexed database next to it (data.csv.sqlite) and only fetches the rows on screen.
+SM_BACKEND = os.environ.get("SM_BACKEND", "memory").lower()
+SQLITE_SUFFIX = ".sqlite"
+# Rows of a SQLite inventory kept decoded, several table pages' worth.
+SQLITE_ROW_CACHE = 2000
+# Index the table fields' trigrams after loading, so searches verify candidates instead of scanning.
+SM_SEARCH_INDEX = os.environ.get("SM_SEARCH_INDEX", "true").lower() == "true"
+# Rows appended or changed by reloads since the index was built, beyond which it is rebuilt.
+INDEX_REBUILD_ROWS = 10000
+# Seconds to wait for the next keystroke before searching; the search then runs in a worker thread.
+SM_SEARCH_DEBOUNCE = max(0.0, env_number("SM_SEARCH_DEBOUNCE", 0.15))
+# Rows a search checks between two looks at whether a newer search superseded it.
+SEARCH_BATCH = 5000
+# "substring" shows the rows containing any search token, in inventory order; "fuzzy" the
+# SM_SEARCH_TOP_K rows best matching all tokens fzf-style in the fields below, best first.
+SEARCH_MODES = ("substring", "fuzzy")
+SM_SEARCH_MODE = os.environ.get("SM_SEARCH_MODE", "substring").lower()
+if SM_SEARCH_MODE not in SEARCH_MODES:
+    logging.warning(f"Ignoring invalid value for SM_SEARCH_MODE: {SM_SEARCH_MODE!r}")
+    SM_SEARCH_MODE = "substring"
+SM_SEARCH_TOP_K = max(1, env_number("SM_SEARCH_TOP_K", 200, int))
+FUZZY_FIELDS = ("name", "ip", "aliases")
+# fzf-style scoring: points per matched character, a bonus where it starts a word (doubled
+# for the token's first character) or continues the previous one, a penalty for a gap.
+FUZZY_MATCH = 16
+FUZZY_BOUNDARY = 8
+FUZZY_CONSECUTIVE = 4
+FUZZY_GAP_START = -3
+FUZZY_GAP_EXTENSION = -1
+# Header spellings that differ from the canonical field name by more than case.
+HEADER_ALIASES = {"alias": "aliases"}
+
+
+def canonical_field(header: str) -> str | None:
+    """Canonical field for a CSV header, or None for columns outside the schema."""
+    key = header.strip().lower()
+    key = HEADER_ALIASES.get(key, key)
+    return key if key in RECORD_FIELDS else None
+
+
+class SwitchRecord:
+    """One inventory row, with its fields resolved onto the canonical schema at load time."""
+    __slots__ = RECORD_FIELDS + ("extra",)
+
+    def __init__(self, values: dict, extra: dict | None = None):
+        for field in RECORD_FIELDS:
+            setattr(self, field, values.get(field, ""))
+        self.extra = extra  # Columns outside the schema, by stripped header.
+
+    def items(self):
+        """(field, value) pairs of the record, schema fields first."""
+        for field in RECORD_FIELDS:
+            yield field, getattr(self, field)
+        if self.extra:
+            yield from self.extra.items()
+
+
+class CategoricalColumn:
+    """A dictionary-encoded column: a table of distinct values plus one small integer code per row."""
+    def __init__(self):
+        self.values = []   # code -> value
+        self._codes_by_value = {}
+        self.codes = array.array("H")
+
+    @classmethod
+    def from_codes(cls, values: list, codes: array.array) -> "CategoricalColumn":
+        column = cls()
+        column.values = values
+        column._codes_by_value = {value: code for code, value in enumerate(values)}
+        column.codes = codes
+        return column
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+    def __setitem__(self, row: int, value: str) -> None:
+        code = self.code(value)  # May widen self.codes.
+        self.codes[row] = code
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+    def code(self, value: str) -> int:
+        """Code of a value, adding it to the value table if it is new."""
+        code = self._codes_by_value.get(value)
+        if code is None:
+            code = self._codes_by_value[value] = len(self.values)
+            self.values.append(value)
+            if code > 0xFFFF and self.codes.typecode == "H":
+                self.codes = array.array("I", self.codes)  # More distinct values than 16 bit codes hold.
+        return code
+
+    def extend(self, values) -> None:
+        code = self.code
+        for value in values:
+            self.codes.append(code(value))
+
+    def extend_codes(self, values: list, codes: array.array) -> None:
+        """Append rows encoded against another value table (e.g. a column parsed elsewhere)."""
+        mapping = [self.code(value) for value in values]
+        self.codes.extend(array.array(self.codes.typecode, map(mapping.__getitem__, codes)))
+
+    def codes_matching(self, value: str) -> set:
+        """Codes of the values equal to `value`, ignoring case."""
+        value = value.casefold()
+        return {code for code, candidate in enumerate(self.values) if candidate.casefold() == value}
+
+
+class MappedTextColumn:
+    """A text column backed by a snapshot: cells are decoded from the mapped file only when read.
+
+    Rows appended after loading are kept in a plain list behind the mapped ones,
+    and mapped cells changed after loading in a dict.
+    """
+    def __init__(self, data: memoryview, offsets: memoryview):
+        self._data = data        # UTF-8 bytes of all cells, back to back.
+        self._offsets = offsets  # Start of every cell plus the end of the last one.
+        self._mapped = len(offsets) - 1
+        self._tail = []
+        self._changed = {}
+
+    def __len__(self) -> int:
+        return self._mapped + len(self._tail)
+
+    def __getitem__(self, row: int) -> str:
+        if row < self._mapped:
+            if self._changed and row in self._changed:
+                return self._changed[row]
+            return str(self._data[self._offsets[row]:self._offsets[row + 1]], "utf-8")
+        return self._tail[row - self._mapped]
+
+    def __setitem__(self, row: int, value: str) -> None:
+        if row < self._mapped:
+            self._changed[row] = value
+        else:
+            self._tail[row - self._mapped] = value
+
+    def __iter__(self):
+        data, offsets, changed = self._data, self._offsets, self._changed
+        for row in range(self._mapped):
+            if row in changed:
+                yield changed[row]
+            else:
+                yield str(data[offsets[row]:offsets[row + 1]], "utf-8")
+        yield from self._tail
+
+    def extend(self, values) -> None:
+        self._tail.extend(values)
+
+
+class ConstantColumn:
+    """A read-only column holding the same value in every row."""
+    def __init__(self, value: str, length: int):
+        self.value = value
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, row: int) -> str:
+        return self.value
+
+    def __iter__(self):
+        return itertools.repeat(self.value, self.length)
+
+
+class InventoryStore:
+    """The switch inventory, held column by column.
+
+    Every field is one list of strings and a row is just its index, so no
+    per-row object exists. Categorical fields are dictionary-encoded
+    (CategoricalColumn), so their cells cost two bytes and filters on them
+    compare integers. Filtered and sorted views of the inventory are
+    array('I') of row indices rather than copied rows.
+
+    Rows dropped by a reload stay in the columns as tombstones (`removed`), so
+    the indices of the others remain valid; len() counts them, live_count not.
+
+    Searches look at `haystacks`: per row, its table fields casefolded and
+    joined by HAYSTACK_SEPARATOR, kept in step with the columns.
+    """
+    def __init__(self, extra_fields=()):
+        self.fields = RECORD_FIELDS + tuple(extra_fields)  # Schema fields, then columns outside the schema.
+        self.columns = {
+            field: CategoricalColumn() if field in CATEGORICAL_FIELDS else [] for field in self.fields
+        }
+        self._rows_by_ip = None  # Built on first use, dropped on every change.
+        self.removed = set()
+        self.haystacks = []
+        self.search_index = None  # TrigramIndex, built in the background once loaded.
+
+    def __len__(self) -> int:
+        return len(self.columns["name"])
+
+    @property
+    def live_count(self) -> int:
+        return len(self) - len(self.removed)
+
+    def live_rows(self):
+        """The rows that are not tombstones, in order."""
+        if not self.removed:
+            return range(len(self))
+        removed = self.removed
+        return (row for row in range(len(self)) if row not in removed)
+
+    def extend(self, rows: list, plan: list) -> None:
+        """Append parsed CSV rows; plan holds the CSV column index (or None) of every field."""
+        for field, index in zip(self.fields, plan):
+            column = self.columns[field]
+            if index is None:
+                column.extend("" for _ in rows)
+                continue
+            values = (row[index] if index < len(row) else "" for row in rows)
+            if field == "ip":
+                column.extend(value.strip() for value in values)
+            else:
+                column.extend(values)
+        self._rows_by_ip = None
+        self.extend_haystacks()
+
+    def extend_parsed(self, columns: dict) -> None:
+        """Append the columns of a store parsed elsewhere, as returned by parse_csv_range."""
+        for field in self.fields:
+            column = self.columns[field]
+            if isinstance(column, CategoricalColumn):
+                column.extend_codes(*columns[field])
+            else:
+                column.extend(columns[field])
+        self._rows_by_ip = None
+        self.extend_haystacks()
+
+    def extend_haystacks(self) -> None:
+        """Add the haystacks of the rows appended to the columns since the last call."""
+        rows = range(len(self.haystacks), len(self))
+        columns = [map(self.columns[field].__getitem__, rows) for field in TABLE_FIELDS]
+        self.haystacks.extend(HAYSTACK_SEPARATOR.join(values).casefold() for values in zip(*columns))
+
+    def rows_containing(self, tokens: tuple, rows, cancelled=None) -> array.array | None:
+        """Those of `rows` with any of the (casefolded) tokens in a table field.
+
+        Checks a batch of rows at a time, returning None once cancelled() is true.
+        """
+        haystacks = self.haystacks
+        found = array.array("I")
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, SEARCH_BATCH)):
+            if cancelled is not None and cancelled():
+                return None
+            # One plain substring test per row and token: no per-row strings or generators.
+            if len(tokens) == 1:
+                token = tokens[0]
+                found.extend([row for row in batch if token in haystacks[row]])
+                continue
+            hits = set()
+            for token in tokens:
+                hits.update([row for row in batch if token in haystacks[row]])
+            found.extend(sorted(hits))
+        return found
+
+    def rows_fuzzy(self, tokens: tuple, rows, cancelled=None) -> array.array | None:
+        """Those of `rows` with the characters of every token in order in one of FUZZY_FIELDS.
+
+        Checks a batch of rows at a time, returning None once cancelled() is true.
+        """
+        haystacks = self.haystacks
+        matchers = [fuzzy_matcher(token) for token in tokens]
+        found = array.array("I")
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, SEARCH_BATCH)):
+            if cancelled is not None and cancelled():
+                return None
+            for match in matchers:
+                batch = [row for row in batch if match(haystacks[row])]
+            found.extend(batch)
+        return found
+
+    def rank_fuzzy(self, tokens: tuple, rows, limit: int, cancelled=None) -> array.array | None:
+        """The `limit` best of `rows` (all matching every token) by fuzzy_score, best first.
+
+        A bounded heap keeps the best rows seen so far, so ranking costs O(n log limit);
+        equal scores keep inventory order. None once cancelled() is true.
+        """
+        haystacks = self.haystacks
+        fields = [TABLE_FIELDS.index(field) for field in FUZZY_FIELDS]
+        # Split off the fields after the last fuzzy one, so every value is a single field.
+        splits = max(fields) + 1
+        # Once the heap holds `limit` rows with the best possible score, no later row can enter.
+        best = sum(fuzzy_score(token, token) for token in tokens)
+        heap = []
+        for count, row in enumerate(rows):
+            if count % SEARCH_BATCH == 0 and cancelled is not None and cancelled():
+                return None
+            values = haystacks[row].split(HAYSTACK_SEPARATOR, splits)
+            values = [values[field] for field in fields]
+            score = 0
+            for token in tokens:
+                # The token's best field; rows_fuzzy found it in order in at least one.
+                scores = [fuzzy_score(token, value) for value in values]
+                score += max(field_score for field_score in scores if field_score is not None)
+            item = (score, -row)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+            if len(heap) == limit and heap[0][0] >= best:
+                break
+        return array.array("I", (-row for _, row in sorted(heap, reverse=True)))
+
+    def all_rows(self) -> array.array:
+        return array.array("I", self.live_rows())
+
+    def record(self, row: int) -> SwitchRecord:
+        """Materialize one row, e.g. for the details screen."""
+        values = {field: self.columns[field][row] for field in RECORD_FIELDS}
+        extra = {field: self.columns[field][row] for field in self.fields[len(RECORD_FIELDS):]}
+        return SwitchRecord(values, extra or None)
+
+    def rows_where(self, field: str, value: str, rows=None) -> array.array:
+        """Rows (of `rows`, default all) whose categorical field equals value, ignoring case."""
+        column = self.columns[field]
+        wanted = column.codes_matching(value)
+        if not wanted:
+            return array.array("I")
+        codes = column.codes
+        if rows is None:
+            rows = self.live_rows()
+        if len(wanted) == 1:
+            (code,) = wanted
+            return array.array("I", (row for row in rows if codes[row] == code))
+        return array.array("I", (row for row in rows if codes[row] in wanted))
+
+    def value_counts(self, field: str) -> list:
+        """(value, rows) pairs of a categorical field, most frequent first."""
+        column = self.columns[field]
+        codes = column.codes
+        counts = collections.Counter(codes if not self.removed else (codes[row] for row in self.live_rows()))
+        return [(column.values[code], count) for code, count in counts.most_common()]
+
+    def rows_with_ip(self, ip: str) -> list:
+        if self._rows_by_ip is None:
+            self._rows_by_ip = {}
+            ips = self.columns["ip"]
+            for row in self.live_rows():
+                self._rows_by_ip.setdefault(ips[row], []).append(row)
+        return self._rows_by_ip.get(ip, [])
+
+    def conformed(self, fields: tuple, constants: dict) -> "InventoryStore":
+        """This store's rows under another schema, sharing its columns.
+
+        Fields this store lacks, and those in `constants`, hold a constant
+        (default "") in every row.
+        """
+        store = InventoryStore(extra_fields=fields[len(RECORD_FIELDS):])
+        store.columns = {
+            field: self.columns[field] if field in self.columns and field not in constants
+            else ConstantColumn(constants.get(field, ""), len(self))
+            for field in fields
+        }
+        if any(field in constants for field in TABLE_FIELDS):
+            store.extend_haystacks()
+        else:
+            store.haystacks = self.haystacks  # Same table fields.
+        return store
+
+    def append(self, other: "InventoryStore") -> range:
+        """Append all rows of a store with the same fields; returns their rows here."""
+        first = len(self)
+        for field in self.fields:
+            self.columns[field].extend(other.columns[field])
+        self.haystacks.extend(other.haystacks)
+        self._rows_by_ip = None
+        return range(first, len(self))
+
+    def row_key(self, row: int) -> tuple:
+        """Identity of a row across reloads: its name, or its IP when it has no name."""
+        name = self.columns["name"][row]
+        return ("name", name) if name else ("ip", self.columns["ip"][row])
+
+    def diff(self, new: "InventoryStore", rows=None) -> tuple[list, list, list]:
+        """How to turn `rows` (default all) of this store into `new`: (added, removed, changed).
+
+        new has the same fields. Rows are matched by row_key, duplicate keys in
+        order of appearance. added lists the rows of new without a match, removed
+        the rows of this store without one, and changed (row, new row) pairs of
+        matches whose values differ.
+        """
+        unmatched = {}
+        for row in self.live_rows() if rows is None else rows:
+            unmatched.setdefault(self.row_key(row), collections.deque()).append(row)
+        columns = [(self.columns[field], new.columns[field]) for field in self.fields]
+        added, changed = [], []
+        for new_row in range(len(new)):
+            rows = unmatched.get(new.row_key(new_row))
+            if not rows:
+                added.append(new_row)
+                continue
+            row = rows.popleft()
+            if any(old[row] != current[new_row] for old, current in columns):
+                changed.append((row, new_row))
+        removed = sorted(row for rows in unmatched.values() for row in rows)
+        return added, removed, changed
+
+    def apply_diff(self, new: "InventoryStore", diff: tuple) -> range:
+        """Apply diff(new) to this store; returns the rows it appended."""
+        added, removed, changed = diff
+        for row, new_row in changed:
+            for field in self.fields:
+                column, value = self.columns[field], new.columns[field][new_row]
+                if column[row] != value:
+                    column[row] = value
+            self.haystacks[row] = new.haystacks[new_row]
+        if self.search_index is not None:
+            self.search_index.stale.update(row for row, _ in changed)
+        self.removed.update(removed)
+        first = len(self)
+        for field in self.fields:
+            column = new.columns[field]
+            self.columns[field].extend([column[new_row] for new_row in added])
+        self.haystacks.extend([new.haystacks[new_row] for new_row in added])
+        self._rows_by_ip = None
+        return range(first, len(self))
+
+
+class TrigramIndex:
+    """Trigram postings of an InventoryStore's table fields, for substring search.
+
+    postings maps every three characters occurring in a row's haystack (its
+    casefolded table fields) to the ascending rows they occur in. A search token of three or more
+    characters can only be in the rows listed under each of its trigrams, so
+    searching verifies those candidates instead of scanning the inventory. Rows
+    appended after the build (from `indexed` on) and rows changed since (`stale`)
+    are candidates of every token; tombstones are left to the caller.
+    """
+    def __init__(self, store: InventoryStore):
+        self.store = store
+        self.postings = {}
+        self.indexed = 0
+        self.stale = set()
+
+    def build(self, cancelled=None) -> bool:
+        """Index the store's current rows (e.g. in a worker thread); False if cancelled."""
+        count = len(self.store)
+        postings = self.postings
+        for row, haystack in enumerate(itertools.islice(self.store.haystacks, count)):
+            if row % LOAD_CHUNK == 0 and cancelled is not None and cancelled():
+                return False
+            # Trigrams spanning two fields contain the separator, which no token does.
+            for trigram in {haystack[i:i + 3] for i in range(len(haystack) - 2)}:
+                rows = postings.get(trigram)
+                if rows is None:
+                    rows = postings[trigram] = array.array("I")
+                rows.append(row)
+        self.indexed = count
+        return True
+
+    @property
+    def outdated(self) -> bool:
+        return len(self.store) - self.indexed + len(self.stale) >= INDEX_REBUILD_ROWS
+
+    def matching(self, token: str) -> list | None:
+        """Indexed rows containing all trigrams of a token (three or more characters).
+
+        None if even its rarest trigram is in a quarter of the rows: scanning the haystacks is cheaper then.
+        """
+        postings = sorted((self.postings.get(token[i:i + 3], ()) for i in range(len(token) - 2)), key=len)
+        if len(postings[0]) * 4 > len(self.store):
+            return None
+        rows = postings[0]
+        for other in postings[1:]:
+            if not rows:
+                break
+            if len(rows) * 16 < len(other):
+                # Few candidates left: look them up in the sorted postings instead of hashing all of them.
+                rows = [row for row in rows if (i := bisect.bisect_left(other, row)) < len(other) and other[i] == row]
+            else:
+                contained = set(other)
+                rows = [row for row in rows if row in contained]
+        return rows
+
+    def candidates(self, tokens: list) -> list | None:
+        """Ascending rows that may contain any of the tokens; None if one does not narrow them down."""
+        if any(len(token) < 3 for token in tokens):
+            return None
+        rows = set(self.stale)
+        rows.update(range(self.indexed, len(self.store)))
+        for token in tokens:
+            matching = self.matching(token)
+            if matching is None:
+                return None
+            rows.update(matching)
+        return sorted(rows)
+
+
+@functools.lru_cache(maxsize=256)
+def fuzzy_matcher(token: str):
+    """A test whether a haystack has the characters of token in order within one of FUZZY_FIELDS.
+
+    A regular expression, so rows are tested without leaving C: it skips to the
+    field, then to each character past the previous one, never past the field's
+    end. Every skip stops short of the character that follows it, so there is
+    nothing to backtrack into.
+    """
+    skip_field = "[^\\x00]*\\x00"
+    fields = "|".join(f"(?:{skip_field}){{{TABLE_FIELDS.index(field)}}}" for field in FUZZY_FIELDS)
+    characters = "".join(f"[^\\x00{re.escape(char)}]*{re.escape(char)}" for char in token)
+    return re.compile(f"(?:{fields}){characters}").match
+
+
+def fuzzy_score(token: str, text: str) -> int | None:
+    """fzf-style score of the characters of token appearing in order in text; None if they do not.
+
+    Like fzf, scores the first match, shortened by searching back from its end.
+    The best possible score of a token is fuzzy_score(token, token).
+    """
+    position = 0
+    for char in token:
+        position = text.find(char, position)
+        if position < 0:
+            return None
+        position += 1
+    stop = position
+    for char in reversed(token):
+        position = text.rfind(char, 0, position)
+    score = run_bonus = 0
+    previous = position
+    for index, char in enumerate(token):
+        position = text.find(char, position, stop)
+        bonus = FUZZY_BOUNDARY if position == 0 or not text[position - 1].isalnum() else 0
+        if index > 0 and position == previous + 1:
+            # A run of characters keeps the bonus of its first one.
+            bonus = max(bonus, run_bonus, FUZZY_CONSECUTIVE)
+        else:
+            if index > 0:
+                score += FUZZY_GAP_START + FUZZY_GAP_EXTENSION * (position - previous - 2)
+            run_bonus = bonus
+        score += FUZZY_MATCH + (2 * bonus if index == 0 else bonus)
+        previous = position
+        position += 1
+    return score
+
+
+def parse_search(text: str, fields) -> tuple[frozenset, tuple]:
+    """A (casefolded) search text's filters and substring tokens.
+
+    field=value tokens on categorical `fields` are exact matches that must all
+    hold, as (field, value) pairs; a row matches the other tokens if any of them
+    is a substring of one of its table fields.
+    """
+    filters, tokens = set(), []
+    for token in text.split():
+        field, sep, value = token.partition("=")
+        field = (canonical_field(field) or field.lower()) if sep else None
+        if field in CATEGORICAL_FIELDS and field in fields:  # "source" only with several files.
+            filters.add((field, value))
+        else:
+            tokens.append(token)
+    return frozenset(filters), tuple(tokens)
+
+
+def narrows(old: tuple, new: tuple, fuzzy: bool = False) -> bool:
+    """Whether every row matching parsed search `new` also matches parsed search `old`."""
+    old_filters, old_tokens = old
+    new_filters, new_tokens = new
+    if not old_filters <= new_filters:
+        return False
+    if not old_tokens:
+        return True
+    if fuzzy:
+        # All tokens must match: each old one must be in order within a new one, e.g. "s1" in "sw01".
+        return all(any(is_subsequence(token, new_token) for new_token in new_tokens) for token in old_tokens)
+    # Each new token must contain an old one, e.g. "sw01" after "sw0"; an added token widens the search.
+    return bool(new_tokens) and all(any(token in new_token for token in old_tokens) for new_token in new_tokens)
+
+
+def is_subsequence(part: str, text: str) -> bool:
+    characters = iter(text)
+    return all(char in characters for char in part)
+
+
+class SearchStack:
+    """The results of recent searches, each narrowing the one below it.
+
+    Typing on usually narrows the search, so its results are found among the
+    last ones instead of the whole inventory. Deleting characters pops back to
+    a search already answered. Clear it whenever the inventory changes; searches
+    run in worker threads, so results of a search that started before are dropped.
+    """
+    def __init__(self):
+        self.entries = []  # (text, parsed search, rows)
+        self.generation = 0  # Bumped by clear().
+        self.lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def results(self, text: str, fields, search, generation: int | None = None,
+                fuzzy: bool = False) -> array.array | None:
+        """Rows matching a search text; search(parsed, rows) filters rows (None for all) when needed.
+
+        generation is that of the stack when the inventory to search was taken
+        (default: now). None if search() returns None, i.e. the search was cancelled.
+        Clear the stack before switching between fuzzy and substring searches.
+        """
+        parsed = parse_search(text, fields)
+        base = None
+        with self.lock:
+            if generation is None:
+                generation = self.generation
+            if generation == self.generation:
+                entries = self.entries
+                while entries and not narrows(entries[-1][1], parsed, fuzzy):
+                    entries.pop()
+                if entries and entries[-1][1] == parsed:
+                    return entries[-1][2]
+                base = entries[-1][2] if entries else None
+        rows = search(parsed, base)
+        with self.lock:
+            if rows is not None and generation == self.generation:
+                self.entries.append((text, parsed, rows))
+        return rows
+
+
+def new_inventory(header: list | None) -> tuple[InventoryStore, list]:
+    """An empty store for a CSV header, plus the plan (CSV index of every store field) to fill it."""
+    if header is None:
+        store = InventoryStore()
+        return store, [None] * len(store.fields)
+    positions = {}
+    for index, name in enumerate(header):
+        positions.setdefault(canonical_field(name) or name.strip(), index)
+    store = InventoryStore(extra_fields=[field for field in positions if field not in RECORD_FIELDS])
+    return store, [positions.get(field) for field in store.fields]
+
+
+def load_inventory(f) -> InventoryStore:
+    """Parse an inventory CSV into an InventoryStore, resolving the header once."""
+    reader = csv.reader(f, delimiter=SM_DELIMITER)
+    store, plan = new_inventory(next(reader, None))
+    store.extend(list(reader), plan)
+    return store
+
+
+def split_csv(f, start: int, size: int, first_bytes: int, range_bytes: int) -> list:
+    """Split binary file f from `start` to `size` into (start, end) byte ranges of whole records.
+
+    A newline ends a record unless it lies in a quoted field, i.e. unless an odd
+    number of quotes precedes it (an escaped quote "" counts twice, so it keeps
+    the parity). Ranges are about range_bytes long, the first about first_bytes.
+    """
+    bounds = [start]
+    target = start + first_bytes
+    position = start   # File offset of the current block.
+    quotes = 0         # Quotes between start and position + offset.
+    f.seek(start)
+    while target < size and (block := f.read(1 << 20)):
+        offset = 0
+        while target < size:
+            newline = block.find(b"\n", max(offset, target - position))
+            if newline == -1:
+                break
+            quotes += block.count(b'"', offset, newline)
+            offset = newline
+            if quotes % 2 == 0:
+                bounds.append(position + newline + 1)
+                target = bounds[-1] + range_bytes
+            else:
+                target = position + newline + 1  # Inside a quoted field: try the next newline.
+        quotes += block.count(b'"', offset)
+        position += len(block)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_csv_range(path: str, start: int, end: int, plan: list, extra_fields: tuple, delimiter: str) -> dict:
+    """Parse the records in bytes start..end of a CSV into columns, in a parse process.
+
+    Categorical columns come back as (values, codes), see InventoryStore.extend_parsed.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    store = InventoryStore(extra_fields)
+    store.extend(list(csv.reader(io.StringIO(data.decode("utf-8"), newline=""), delimiter=delimiter)), plan)
+    return {
+        field: (column.values, column.codes) if isinstance(column, CategoricalColumn) else column
+        for field, column in store.columns.items()
+    }
+
+
+def process_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    # Spawned rather than forked: the loading process runs threads (the UI among them).
+    context = multiprocessing.get_context("spawn")
+    if os.name == "posix":
+        # The pool's resource tracker process inherits stderr, which Textual replaces by
+        # a capture without a file descriptor; start the tracker on the real one.
+        with contextlib.redirect_stderr(sys.__stderr__):
+            multiprocessing.resource_tracker.ensure_running()
+    return concurrent.futures.ProcessPoolExecutor(workers, mp_context=context)
+
+
+def parallel_csv_chunks(csv_file: Path, workers: int) -> tuple:
+    """An empty store for csv_file plus an iterator of its parsed chunks as (columns, end offset).
+
+    The records are parsed by a pool of processes, and the chunks come out in file
+    order, ready for store.extend_parsed. Closing the iterator stops the pool.
+    """
+    size = csv_file.stat().st_size
+    with csv_file.open("rb") as f:
+        header_line = f.readline()
+        ranges = split_csv(f, len(header_line), size, PARALLEL_FIRST_RANGE, PARALLEL_RANGE)
+    header = next(csv.reader([header_line.decode("utf-8")], delimiter=SM_DELIMITER), None)
+    store, plan = new_inventory(header)
+    extra_fields = store.fields[len(RECORD_FIELDS):]
+
+    def chunks():
+        with process_pool(workers) as pool:
+            futures = [
+                pool.submit(parse_csv_range, str(csv_file), start, end, plan, extra_fields, SM_DELIMITER)
+                for start, end in ranges
+            ]
+            try:
+                for future, (_, end) in zip(futures, ranges):
+                    yield future.result(), end
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    return store, chunks()
+
+
+# Compressed inventories are recognized by their first bytes, whatever the file is called.
+COMPRESSION_MAGIC = ((b"\x1f\x8b", "gzip"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd"))
+
+
+def csv_compression(csv_file: Path) -> str | None:
+    """"gzip", "xz" or "zstd" for a compressed CSV file, None for plain text."""
+    with csv_file.open("rb") as f:
+        head = f.read(6)
+    return next((name for magic, name in COMPRESSION_MAGIC if head.startswith(magic)), None)
+
+
+@contextlib.contextmanager
+def open_csv(csv_file: Path):
+    """Open a CSV file as text, decompressing gzip, xz or zstd on the fly.
+
+    Yields (text file, raw file). Decompression streams, so only the reader's
+    buffers are held in memory; the raw file's tell() is the position in the file
+    on disk, for progress against its size.
+    """
+    compression = csv_compression(csv_file)
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("reading zstd-compressed CSV files needs the zstandard package")
+    with csv_file.open("rb") as raw:
+        if compression == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        elif compression == "xz":
+            stream = lzma.LZMAFile(raw)
+        elif compression == "zstd":
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=False))
+        else:
+            stream = raw
+        with io.TextIOWrapper(stream, encoding="utf-8", newline="") as f:
+            yield f, raw
+
+
+def parallel_parse(csv_file: Path, stat: os.stat_result) -> bool:
+    """Whether to parse a CSV file with a pool of processes: large and not compressed."""
+    return (SM_LOAD_WORKERS > 1 and stat.st_size >= PARALLEL_LOAD_MIN_BYTES
+            and csv_compression(csv_file) is None)  # Compressed data cannot be split by byte ranges.
+
+
+def load_inventory_parallel(csv_file: Path, workers: int) -> InventoryStore:
+    """Parse a CSV file into an InventoryStore with a pool of processes."""
+    store, chunks = parallel_csv_chunks(csv_file, workers)
+    for columns, _ in chunks:
+        store.extend_parsed(columns)
+    return store
+
+
+def parse_inventory(csv_file: Path) -> InventoryStore:
+    """Parse a whole CSV file, with a pool of processes if it is large."""
+    if parallel_parse(csv_file, csv_file.stat()):
+        try:
+            return load_inventory_parallel(csv_file, SM_LOAD_WORKERS)
+        except BrokenProcessPool as e:
+            logging.warning(f"Parallel parse of {csv_file} failed, parsing it in one process: {e}")
+    with open_csv(csv_file) as (f, _):
+        return load_inventory(f)
+
+
+def load_csv_file(path: str) -> InventoryStore:
+    """Parse a whole CSV file in one go (e.g. in a pool process)."""
+    with open_csv(Path(path)) as (f, _):
+        return load_inventory(f)
+
+
+def inventory_paths(spec: str) -> list:
+    """The CSV files named by SM_CSV_DATA: paths or glob patterns, separated by os.pathsep."""
+    paths = []
+    for entry in filter(None, spec.split(os.pathsep)):
+        if not any(char in entry for char in "*?["):
+            paths.append(Path(entry))
+            continue
+        for match in sorted(glob.glob(entry)):
+            # Skip the snapshots and databases kept next to the CSV files.
+            if not match.endswith((SNAPSHOT_SUFFIX, SQLITE_SUFFIX, ".tmp")):
+                paths.append(Path(match))
+    return list(dict.fromkeys(paths)) or [Path(spec)]
+
+
+def write_snapshot(store: InventoryStore, csv_file: Path, stat: os.stat_result) -> None:
+    try:
+        save_snapshot(store, csv_file, stat)
+    except OSError as e:
+        # E.g. a read-only directory: loading still works, just without the shortcut.
+        logging.warning(f"Could not write inventory snapshot for {csv_file}: {e}")
+
+
+def load_sources(paths: list) -> list:
+    """Stores of several CSV files: from their snapshots where valid, the others parsed concurrently."""
+    stores = [None] * len(paths)
+    pending = []
+    for index, path in enumerate(paths):
+        if not path.exists():
+            logging.debug(f"Inventory source {path} does not exist")
+            stores[index] = InventoryStore()
+        elif SM_SNAPSHOT:
+            stores[index], _ = load_snapshot(path)
+        if stores[index] is None:
+            pending.append(index)
+    if not pending:
+        return stores
+    stats = [paths[index].stat() for index in pending]
+    parsed = None
+    if SM_LOAD_WORKERS > 1 and len(pending) > 1:
+        try:
+            with process_pool(min(SM_LOAD_WORKERS, len(pending))) as pool:
+                parsed = list(pool.map(load_csv_file, [str(paths[index]) for index in pending]))
+        except (BrokenProcessPool, OSError) as e:
+            logging.warning(f"Parallel load of the inventory sources failed, loading them one by one: {e}")
+    if parsed is None:
+        parsed = [parse_inventory(paths[index]) for index in pending]
+    for index, stat, store in zip(pending, stats, parsed):
+        stores[index] = store
+        if SM_SNAPSHOT:
+            write_snapshot(store, paths[index], stat)
+    return stores
+
+
+class InventorySources:
+    """Several CSV files merged into one InventoryStore.
+
+    Every row is tagged with its file in a "source" column (the file name without
+    extension). Rows sharing a row_key across files are resolved per `duplicates`:
+    the row(s) of the first or last file listed win, the others are shadowed
+    (tombstones in the store, so they can come back), or "all" keeps them all.
+    Each file is cached (snapshot) and reloaded on its own: a reload diffs the new
+    parse against that file's rows only.
+    """
+    def __init__(self, paths: list, duplicates: str):
+        self.paths = paths
+        self.duplicates = duplicates
+        stems = [path.stem for path in paths]
+        self.tags = {
+            path: stem if stems.count(stem) == 1 else str(path) for path, stem in zip(paths, stems)
+        }
+        self.ranks = {self.tags[path]: rank for rank, path in enumerate(paths)}
+        self.store = InventoryStore()
+        self.rows = {}          # path -> rows of that file in the store, in file order
+        self.shadowed = set()   # Rows hidden by a duplicate from another file.
+        self.rows_by_key = {}   # row_key -> rows, maintained unless duplicates is "all"
+
+    def load(self) -> InventoryStore:
+        """Load all files and return the merged store. Runs in a worker thread."""
+        stores = load_sources(self.paths)
+        extra_fields = []
+        for store in stores:
+            extra_fields.extend(field for field in store.fields[len(RECORD_FIELDS):] if field not in extra_fields)
+        if "source" not in extra_fields:
+            extra_fields.append("source")
+        self.store = merged = InventoryStore(extra_fields)
+        for path, store in zip(self.paths, stores):
+            rows = merged.append(store.conformed(merged.fields, {"source": self.tags[path]}))
+            self.rows[path] = array.array("I", rows)
+        self.shadowed = set()
+        self.rows_by_key = {}
+        if self.duplicates != "all":
+            for row in range(len(merged)):
+                self.rows_by_key.setdefault(merged.row_key(row), []).append(row)
+            self.resolve(list(self.rows_by_key))
+        logging.debug(f"Merged {len(self.paths)} inventory sources into {merged.live_count} switches "
+                      f"({len(self.shadowed)} duplicates shadowed)")
+        return merged
+
+    def resolve(self, keys) -> tuple[set, set]:
+        """Decide again which rows of `keys` are shadowed; returns (newly shadowed, revealed) rows."""
+        shadowed, revealed = set(), set()
+        if self.duplicates == "all":
+            return shadowed, revealed
+        sources = self.store.columns["source"]
+        pick = min if self.duplicates == "first" else max
+        for key in keys:
+            rows = self.rows_by_key.get(key)
+            if not rows:
+                continue
+            winner = pick(self.ranks[sources[row]] for row in rows)
+            for row in rows:
+                if self.ranks[sources[row]] == winner:
+                    if row in self.shadowed:
+                        revealed.add(row)
+                elif row not in self.shadowed:
+                    shadowed.add(row)
+        self.shadowed |= shadowed
+        self.shadowed -= revealed
+        self.store.removed |= shadowed
+        self.store.removed -= revealed
+        return shadowed, revealed
+
+    def prepare_reload(self, path: Path) -> tuple | None:
+        """Parse a changed file and diff it against its rows; None if it brings new fields.
+
+        Runs in a worker thread; apply() takes the result on the event loop.
+        """
+        if path.exists():
+            stat = path.stat()
+            new = parse_inventory(path)
+            if SM_SNAPSHOT:
+                write_snapshot(new, path, stat)
+        else:
+            new = InventoryStore()  # A removed file takes its switches with it.
+        if any(field not in self.store.fields for field in new.fields):
+            return None
+        new = new.conformed(self.store.fields, {"source": self.tags[path]})
+        return new, self.store.diff(new, self.rows[path])
+
+    def apply(self, path: Path, new: InventoryStore, diff: tuple) -> tuple[list, list, list]:
+        """Apply a prepared reload; returns the rows that appeared, disappeared and changed."""
+        store = self.store
+        _, removed, changed = diff
+        removed_keys = [store.row_key(row) for row in removed]
+        added = store.apply_diff(new, diff)
+        gone = set(removed)
+        self.rows[path] = array.array("I", (row for row in self.rows[path] if row not in gone))
+        self.rows[path].extend(added)
+        hidden = gone & self.shadowed
+        self.shadowed -= gone
+        shadowed, revealed = set(), set()
+        if self.duplicates != "all":
+            for row, key in zip(removed, removed_keys):
+                self.rows_by_key[key].remove(row)
+            added_keys = [store.row_key(row) for row in added]
+            for row, key in zip(added, added_keys):
+                self.rows_by_key.setdefault(key, []).append(row)
+            shadowed, revealed = self.resolve(set(removed_keys).union(added_keys))
+        appeared = [row for row in added if row not in shadowed] + sorted(revealed)
+        disappeared = [row for row in removed if row not in hidden] + sorted(shadowed.difference(added))
+        return appeared, disappeared, [row for row, _ in changed]
+
+
+@functools.lru_cache(maxsize=None)
+def inotify_libc():
+    """The C library if it offers inotify (Linux), else None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError) as e:
+        logging.debug(f"inotify unavailable: {e}")
+        return None
+    return libc
+
+
+def read_inotify_names(fd: int) -> set:
+    """Names of the files in all pending events of a non-blocking inotify descriptor."""
+    names = set()
+    while True:
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset < len(data):
+            # struct inotify_event: wd, mask, cookie, len, then len bytes of NUL-padded name.
+            _, _, _, length = struct.unpack_from("iIII", data, offset)
+            names.add(data[offset + 16:offset + 16 + length].rstrip(b"\0"))
+            offset += 16 + length
+
+
+def file_signature(path: Path) -> tuple | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+async def watch_file(path: Path, interval: float):
+    """Yield each time the file at path was written, replaced or removed, once it settled.
+
+    Watches the file's directory with inotify when available, so editors that save
+    by renaming a new file over the old one are noticed; otherwise polls the file's
+    stat every `interval` seconds.
+    """
+    libc = inotify_libc()
+    fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC) if libc is not None else -1
+    if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(path.parent), INOTIFY_MASK) < 0:
+        logging.debug(f"Cannot watch {path.parent}: {os.strerror(ctypes.get_errno())}")
+        os.close(fd)
+        fd = -1
+    if fd < 0:
+        logging.debug(f"Polling {path} for changes every {interval:g}s")
+        last = file_signature(path)
+        while True:
+            await asyncio.sleep(interval)
+            current = file_signature(path)
+            if current == last:
+                continue
+            while True:
+                await asyncio.sleep(WATCH_SETTLE)
+                last, current = current, file_signature(path)
+                if current == last:
                     break
-                line = await proc.stdout.readline()
-                if not line:
+            yield
+    logging.debug(f"Watching {path} with inotify")
+    name = os.fsencode(path.name)
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    loop.add_reader(fd, ready.set)
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            if name not in read_inotify_names(fd):
+                continue
+            # Let the writer finish: wait until the file had no events for a while.
+            while True:
+                await asyncio.sleep(WATCH_SETTLE)
+                ready.clear()
+                if name not in read_inotify_names(fd):
                     break
-                decoded = line.decode()
-                logging.debug(f"StreamingOutputScreen output line: {decoded.strip()}")
-                self.output += decoded
-                if output_widget:
-                    output_widget.update(self.output)
-        except asyncio.CancelledError:
-            logging.debug("stream_output task was cancelled")
-            proc.kill()
-            raise
-        await proc.wait()
-        logging.debug("Subprocess finished in StreamingOutputScreen")
-    
-    async def on_key(self, event: events.Key) -> None:
-        if event.key == "escape":
-            logging.debug("StreamingOutputScreen received ESC key, setting close flag")
-            self._closed = True
-            self.app.call_later(self.app.pop_screen)
-            event.stop()
-    
-    async def on_unmount(self) -> None:
-        logging.debug("StreamingOutputScreen unmounting, cancelling stream task if still running")
-        if self._stream_task and not self._stream_task.done():
-            self._stream_task.cancel()
-            try:
-                await self._stream_task
-            except asyncio.CancelledError:
-                logging.debug("Stream task cancelled in on_unmount")
-        await asyncio.sleep(0.3)
-        try:
-            data_table = self.app.query(DataTable).first()
-        except Exception:
-            data_table = None
-        if data_table:
-            self.app.set_focus(data_table)
-            logging.debug("Focus successfully restored to DataTable in StreamingOutputScreen")
+            yield
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
+
+
+def snapshot_path(csv_file: Path) -> Path:
+    return csv_file.with_name(csv_file.name + SNAPSHOT_SUFFIX)
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def csv_source(csv_file: Path, stat: os.stat_result) -> dict:
+    """What a derived file (snapshot, database) records about the CSV it was made from."""
+    return {
+        "path": str(csv_file.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_digest(csv_file), "delimiter": SM_DELIMITER,
+    }
+
+
+def check_source(source: dict, csv_file: Path) -> bool:
+    """Raise ValueError unless `source` (see csv_source) still describes csv_file.
+
+    It does when path, size and delimiter match and either the mtime or, when only
+    the mtime differs, the content hash does. Returns whether the mtime differed,
+    i.e. whether the recorded source is worth refreshing.
+    """
+    stat = csv_file.stat()
+    if source["delimiter"] != SM_DELIMITER:
+        raise ValueError("made with a different delimiter")
+    if source["path"] != str(csv_file.resolve()) or source["size"] != stat.st_size:
+        raise ValueError("made from a different file")
+    stale = source["mtime_ns"] != stat.st_mtime_ns
+    if stale and source["sha256"] != file_digest(csv_file):
+        raise ValueError("CSV contents changed")
+    return stale
+
+
+def save_snapshot(store: InventoryStore, csv_file: Path, stat: os.stat_result) -> None:
+    """Write the store to the snapshot of csv_file, if the CSV still is what was parsed (stat).
+
+    Layout: magic, header length (uint32), JSON header, then every column's arrays
+    and the search haystacks, 8-byte aligned. The header locates the arrays and records the CSV (path, size,
+    mtime, SHA-256) and settings the snapshot was made from.
+    """
+    current = csv_file.stat()
+    if (current.st_size, current.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+        logging.debug(f"{csv_file} changed while loading; not writing a snapshot")
+        return
+    sections = []
+    columns = {}
+    offset = 0
+
+    def add_section(data: bytes) -> list:
+        nonlocal offset
+        sections.append(data)
+        position = [offset, len(data)]
+        offset += len(data) + (-len(data) % 8)
+        return position
+
+    for field in store.fields:
+        column = store.columns[field]
+        if isinstance(column, CategoricalColumn):
+            columns[field] = {
+                "kind": "categorical", "values": column.values,
+                "typecode": column.codes.typecode, "codes": add_section(column.codes.tobytes()),
+            }
         else:
-            logging.debug("No DataTable found in StreamingOutputScreen on_unmount")
+            encoded = [value.encode("utf-8") for value in column]
+            data = b"".join(encoded)
+            offsets = array.array("I" if len(data) <= 0xFFFFFFFF else "Q",
+                                  itertools.accumulate(map(len, encoded), initial=0))
+            columns[field] = {
+                "kind": "text", "typecode": offsets.typecode,
+                "offsets": add_section(offsets.tobytes()), "data": add_section(data),
+            }
+    # Haystacks as one text with character offsets: restored by slicing instead of rebuilding.
+    text = "".join(store.haystacks)
+    offsets = array.array("I" if len(text) <= 0xFFFFFFFF else "Q",
+                          itertools.accumulate(map(len, store.haystacks), initial=0))
+    haystacks = {
+        "typecode": offsets.typecode,
+        "offsets": add_section(offsets.tobytes()), "data": add_section(text.encode("utf-8")),
+    }
+    header = json.dumps({
+        "source": csv_source(csv_file, stat),
+        "byteorder": sys.byteorder,
+        "rows": len(store),
+        "fields": list(store.fields),
+        "columns": columns,
+        "haystacks": haystacks,
+    }).encode("utf-8")
+    start = len(SNAPSHOT_MAGIC) + 4 + len(header)
+    start += -start % 8
+    target = snapshot_path(csv_file)
+    partial = target.with_name(target.name + ".tmp")
+    with partial.open("wb") as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(bytes(start - f.tell()))
+        for data in sections:
+            f.write(data + bytes(-len(data) % 8))
+    # Readers still mapping the old snapshot keep its contents; new ones see the new file.
+    os.replace(partial, target)
+    logging.debug(f"Wrote snapshot {target} with {len(store)} rows")
 
 
-class OutputScreen(Screen):
-    """A modal screen to display immediate output (or details)."""
-    def __init__(self, output_text: str, **kwargs):
-        logging.debug(f"Initializing OutputScreen with output length: {len(output_text)}")
-        self.output_text = output_text
-        super().__init__(**kwargs)
-    
-    def compose(self) -> ComposeResult:
-        logging.debug("Composing OutputScreen widgets")
-        with Vertical(classes="modal-container"):
-            yield Static("Press ESC to close", id="modal_header", classes="modal-header")
-            yield Vertical(
-                Static(self.output_text, id="output_text", classes="modal-text"),
-                id="modal_body", classes="modal-body"
-            )
-    
-    def update_output(self, new_text: str) -> None:
-        try:
-            widget = self.query("Static#output_text").first()
-            widget.update(new_text)
-        except Exception as e:
-            logging.error(f"Failed to update output: {e}")
-    
-    async def on_key(self, event: events.Key) -> None:
-        if event.key == "escape":
-            logging.debug("OutputScreen received ESC key, scheduling pop_screen")
-            self.app.call_later(self.app.pop_screen)
-            event.stop()
-    
-    async def on_unmount(self) -> None:
-        logging.debug("OutputScreen unmounting, restoring focus to DataTable")
-        await asyncio.sleep(0.3)
+def load_snapshot(csv_file: Path) -> tuple[InventoryStore | None, bool]:
+    """The store saved in the snapshot of csv_file, or None when there is no valid one.
+
+    The snapshot is valid when it was made from this CSV (see check_source). The
+    second value tells whether the snapshot is stale but valid and worth rewriting.
+    """
+    target = snapshot_path(csv_file)
+    try:
+        with target.open("rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        if bytes(view[:len(SNAPSHOT_MAGIC)]) != SNAPSHOT_MAGIC:
+            raise ValueError("bad magic")
+        (header_length,) = struct.unpack_from("<I", view, len(SNAPSHOT_MAGIC))
+        header_start = len(SNAPSHOT_MAGIC) + 4
+        header = json.loads(bytes(view[header_start:header_start + header_length]))
+        start = header_start + header_length
+        start += -start % 8
+        if header["byteorder"] != sys.byteorder or tuple(header["fields"][:len(RECORD_FIELDS)]) != RECORD_FIELDS:
+            raise ValueError("made with different settings")
+        stale = check_source(header["source"], csv_file)
+
+        def section(position: list, typecode: str | None = None) -> memoryview:
+            begin, length = position
+            data = view[start + begin:start + begin + length]
+            if len(data) != length:
+                raise ValueError("truncated")
+            return data.cast(typecode) if typecode else data
+
+        store = InventoryStore(extra_fields=header["fields"][len(RECORD_FIELDS):])
+        rows = header["rows"]
+        for field in store.fields:
+            entry = header["columns"][field]
+            if entry["kind"] == "categorical":
+                codes = array.array(entry["typecode"])
+                codes.frombytes(section(entry["codes"]))
+                column = CategoricalColumn.from_codes(entry["values"], codes)
+            else:
+                column = MappedTextColumn(section(entry["data"]), section(entry["offsets"], entry["typecode"]))
+            if len(column) != rows:
+                raise ValueError(f"column {field} has {len(column)} rows, expected {rows}")
+            store.columns[field] = column
+        entry = header["haystacks"]
+        text = str(section(entry["data"]), "utf-8")
+        offsets = section(entry["offsets"], entry["typecode"]).tolist()
+        if len(offsets) != rows + 1 or offsets[-1] != len(text):
+            raise ValueError("haystacks do not match the rows")
+        store.haystacks = [text[begin:end] for begin, end in zip(offsets, offsets[1:])]
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        logging.debug(f"Not using snapshot {target}: {e}")
+        return None, False
+    logging.debug(f"Loaded {rows} rows from snapshot {target}")
+    return store, stale
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteColumn:
+    """One field of a SqliteInventory, indexable by row like the in-memory columns."""
+    def __init__(self, store: "SqliteInventory", field: str):
+        self.store = store
+        self.field = field
+        self.index = store.fields.index(field)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def __getitem__(self, row: int) -> str:
+        return self.store.row_values(row)[self.index]
+
+    def __iter__(self):
+        cursor = self.store.db.execute(f"SELECT {quote_identifier(self.field)} FROM inventory ORDER BY row")
+        return (value for (value,) in cursor)
+
+
+class SqliteRows:
+    """A filtered, ordered selection of a SqliteInventory's rows.
+
+    Behaves like the array of row indices the in-memory backend uses, but the
+    indices are fetched from the database a page at a time, together with the
+    rows' values so the table can format them without further queries.
+    """
+    PAGE_SIZE = PagedDataTable.PAGE_SIZE
+
+    def __init__(self, store: "SqliteInventory", where: str, params: list, order: str):
+        self.store = store
+        self.where = where
+        self.params = params
+        self.order = order
+        self._length = None
+        self._page_start = None
+        self._page = []
+
+    def __len__(self) -> int:
+        if self._length is None:
+            self._length = self.store.db.execute(
+                f"SELECT count(*) FROM inventory WHERE {self.where}", self.params).fetchone()[0]
+        return self._length
+
+    def __getitem__(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index - index % self.PAGE_SIZE
+        if start != self._page_start:
+            cursor = self.store.select_rows(self.where, self.params, self.order, self.PAGE_SIZE, start)
+            self._page = self.store.cache_rows(cursor.fetchall())
+            self._page_start = start
+        return self._page[index - start]
+
+    def __iter__(self):
+        # One pass over a single cursor; paging with OFFSET would rescan for every page.
+        cursor = self.store.select_rows(self.where, self.params, self.order)
+        while batch := cursor.fetchmany(self.PAGE_SIZE):
+            yield from self.store.cache_rows(batch)
+
+
+class SqliteInventory:
+    """The switch inventory, imported into a SQLite database next to the CSV.
+
+    Offers the interface of InventoryStore, but only the rows being looked at
+    are held in Python. The table fields and the categorical fields are indexed
+    (case-insensitively) for filtering and sorting, and an FTS5 trigram index
+    over the table fields answers substring searches. select() turns the search
+    text into a query and returns a SqliteRows view of the matches.
+    """
+    def __init__(self, path: Path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        columns = [name for (name,) in self.db.execute("SELECT name FROM pragma_table_info('inventory')")]
+        self.fields = tuple(columns[1:])  # After the row number.
+        self.columns = {field: SqliteColumn(self, field) for field in self.fields}
+        self._length = self.db.execute("SELECT count(*) FROM inventory").fetchone()[0]
+        self._rows = {}  # row -> values, see SQLITE_ROW_CACHE
+
+    def close(self) -> None:
+        self.db.close()
+
+    @classmethod
+    def open(cls, csv_file: Path, on_progress=None, cancelled=None) -> "SqliteInventory | None":
+        """The database of csv_file, importing the CSV first unless an up-to-date database exists.
+
+        on_progress(fraction, rows) is called during an import; returns None when
+        cancelled() turns true before the import is done.
+        """
+        path = csv_file.with_name(csv_file.name + SQLITE_SUFFIX)
+        if path.exists():
+            store = None
+            try:
+                store = cls(path)
+                (source,) = store.db.execute("SELECT source FROM meta").fetchone()
+                if store.fields[:len(RECORD_FIELDS)] != RECORD_FIELDS:
+                    raise ValueError("made with a different schema")
+                if check_source(json.loads(source), csv_file):
+                    with store.db:
+                        store.db.execute("UPDATE meta SET source = ?",
+                                         (json.dumps(csv_source(csv_file, csv_file.stat())),))
+                logging.debug(f"Using SQLite inventory {path} with {len(store)} rows")
+                return store
+            except (sqlite3.Error, ValueError, KeyError, TypeError) as e:
+                logging.debug(f"Not using SQLite inventory {path}: {e}")
+                if store is not None:
+                    store.close()
+        partial = path.with_name(path.name + ".tmp")
+        partial.unlink(missing_ok=True)
+        if not cls.import_csv(csv_file, partial, on_progress, cancelled):
+            partial.unlink(missing_ok=True)
+            return None
+        os.replace(partial, path)
+        return cls(path)
+
+    @staticmethod
+    def import_csv(csv_file: Path, path: Path, on_progress=None, cancelled=None) -> bool:
+        started = time.perf_counter()
+        stat = csv_file.stat()
+        total_bytes = max(1, stat.st_size)
+        db = sqlite3.connect(path)
         try:
-            data_table = self.app.query(DataTable).first()
-        except Exception:
-            data_table = None
-        if data_table:
-            self.app.set_focus(data_table)
-            logging.debug("Focus successfully restored to DataTable in OutputScreen")
-        else:
-            logging.debug("No DataTable found in OutputScreen on_unmount")
+            db.execute("PRAGMA journal_mode = OFF")
+            db.execute("PRAGMA synchronous = OFF")
+            with open_csv(csv_file) as (f, raw):
+                reader = csv.reader(f, delimiter=SM_DELIMITER)
+                store, plan = new_inventory(next(reader, None))
+                names = [quote_identifier(field) for field in store.fields]
+                db.execute(f"CREATE TABLE inventory (row INTEGER PRIMARY KEY, {', '.join(names)})")
+                insert = f"INSERT INTO inventory VALUES (?, {', '.join('?' * len(names))})"
+                ip_index = store.fields.index("ip")
+                count = 0
+                while rows := list(itertools.islice(reader, LOAD_CHUNK)):
+                    if cancelled is not None and cancelled():
+                        return False
+                    records = []
+                    for row in rows:
+                        values = [row[index] if index is not None and index < len(row) else "" for index in plan]
+                        values[ip_index] = values[ip_index].strip()
+                        records.append((count, *values))
+                        count += 1
+                    db.executemany(insert, records)
+                    if on_progress is not None:
+                        on_progress(raw.tell() / total_bytes, count)
+            for field in dict.fromkeys(TABLE_FIELDS + CATEGORICAL_FIELDS):
+                db.execute(f"CREATE INDEX {quote_identifier('inventory_' + field)} "
+                           f"ON inventory({quote_identifier(field)} COLLATE NOCASE)")
+            db.execute("CREATE INDEX inventory_ip_exact ON inventory(ip)")
+            db.execute(f"CREATE VIRTUAL TABLE inventory_fts USING fts5("
+                       f"{', '.join(map(quote_identifier, TABLE_FIELDS))}, "
+                       f"content='inventory', content_rowid='row', tokenize='trigram')")
+            db.execute("INSERT INTO inventory_fts(inventory_fts) VALUES ('rebuild')")
+            db.execute("CREATE TABLE meta (source TEXT)")
+            db.execute("INSERT INTO meta VALUES (?)", (json.dumps(csv_source(csv_file, stat)),))
+            db.commit()
+        finally:
+            db.close()
+        logging.debug(f"Imported {count} rows into {path} in {time.perf_counter() - started:.3f}s")
+        return True
 
+    def __len__(self) -> int:
+        return self._length
 
-def launch_external_ssh(ip: str):
-    username = os.environ.get("SM_USER", "")
-    if sys.platform.startswith("darwin"):
-        script = f'''
-        tell application "Terminal"
-            do script "ssh {username}@{ip}"
-            activate
-        end tell
-        '''
-        subprocess.Popen(["osascript", "-e", script])
-    elif sys.platform.startswith("linux"):
-        subprocess.Popen(["xterm", "-e", "-fa", "DejaVuSansMono", "ssh", f"{username}@{ip}"])
-    elif sys.platform.startswith("win"):
-        subprocess.Popen(["start", "cmd", "/k", f"ssh {username}@{ip}"], shell=True)
-    else:
-        raise NotImplementedError("Platform not supported")
+    @property
+    def live_count(self) -> int:
+        return self._length
 
+    def live_rows(self) -> SqliteRows:
+        return self.all_rows()
 
-# Helper function to get column value for sorting.
-def get_value(row, col_index):
-    if col_index == 0:
-        return row.get("Name", row.get("name", ""))
-    elif col_index == 1:
-        return row.get("IP", row.get("ip", ""))
-    elif col_index == 2:
-        return row.get("subnet", row.get("Subnet", ""))
-    elif col_index == 3:
-        return row.get("aliases", row.get("Alias", ""))
-    elif col_index == 4:
-        return row.get("comment", row.get("Comment", ""))
-    else:
-        return ""
+    def select_rows(self, where: str, params: list, order: str, limit: int = -1, offset: int = 0):
+        columns = ", ".join(map(quote_identifier, self.fields))
+        return self.db.execute(
+            f"SELECT row, {columns} FROM inventory WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, limit, offset))
+
+    def cache_rows(self, batch: list) -> list:
+        """Remember the values of fetched (row, *values) records; returns their rows."""
+        if len(self._rows) + len(batch) > SQLITE_ROW_CACHE:
+            self._rows.clear()
+        for record in batch:
+            self._rows[record[0]] = record[1:]
+        return [record[0] for record in batch]
+
+    def row_values(self, row: int) -> tuple:
+        values = self._rows.get(row)
+        if values is None:
+            self.cache_rows(self.select_rows("row = ?", [row], "row").fetchall())
+            values = self._rows[row]
+        return values
+
+    def all_rows(self) -> SqliteRows:
+        return self.select("")
+
+    def select(self, text: str, sort_field: str | None = None, ascending: bool = True) -> SqliteRows:
+        """Rows matching search text, with the same semantics as the in-memory filter.
+
+        field=value tokens compare categorical fields ignoring case and must all
+        hold; any other token matches as a substring of one of the table fields.
+        Tokens of three or more characters go through the trigram index, shorter
+        ones fall back to LIKE.
+        """
+        clauses, params, substrings = [], [], []
+        for token in text.split():
+            field, sep, value = token.partition("=")
+            field = canonical_field(field) if sep else None
+            if field in CATEGORICAL_FIELDS:
+                clauses.append(f"{quote_identifier(field)} = ? COLLATE NOCASE")
+                params.append(value)
+            else:
+                substrings.append(token)
+        if substrings:
+            matches = []
+            indexed = [token for token in substrings if len(token) >= 3]
+            if indexed:
+                matches.append("row IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?)")
+                params.append(" OR ".join('"' + token.replace('"', '""') + '"' for token in indexed))
+            for token in substrings:
+                if len(token) < 3:
+                    pattern = "%" + re.sub(r"([\\%_])", r"\\\1", token) + "%"
+                    matches.append("(" + " OR ".join(
+                        f"{quote_identifier(field)} LIKE ? ESCAPE '\\'" for field in TABLE_FIELDS) + ")")
+                    params.extend([pattern] * len(TABLE_FIELDS))
+            clauses.append("(" + " OR ".join(matches) + ")")
+        order = "row"
+        if sort_field is not None:
+            order = f"{quote_identifier(sort_field)} COLLATE NOCASE {'ASC' if ascending else 'DESC'}, row"
+        return SqliteRows(self, " AND ".join(clauses) or "1", params, order)
+
+    def record(self, row: int) -> SwitchRecord:
+        values = dict(zip(self.fields, self.row_values(row)))
+        extra = {field: values[field] for field in self.fields[len(RECORD_FIELDS):]}
+        return SwitchRecord(values, extra or None)
+
+    def rows_where(self, field: str, value: str, rows=None) -> list:
+        matches = [row for (row,) in self.db.execute(
+            f"SELECT row FROM inventory WHERE {quote_identifier(field)} = ? COLLATE NOCASE ORDER BY row", (value,))]
+        if rows is None:
+            return matches
+        wanted = set(rows)
+        return [row for row in matches if row in wanted]
+
+    def value_counts(self, field: str) -> list:
+        column = quote_identifier(field)
+        return self.db.execute(
+            f"SELECT {column}, count(*) FROM inventory GROUP BY {column} ORDER BY 2 DESC").fetchall()
+
+    def rows_with_ip(self, ip: str) -> list:
+        return [row for (row,) in self.db.execute("SELECT row FROM inventory WHERE ip = ? ORDER BY row", (ip,))]
 
 
 class SwitchManagerApp(App):
@@ -200,13 +2702,41 @@ class SwitchManagerApp(App):
         logging.debug(f"Initializing SwitchManagerApp with CSV path: {csv_path}")
         super().__init__(**kwargs)
         self.csv_path = csv_path
-        self.data = []          # All rows loaded from CSV.
-        self.filtered_data = [] # Filtered rows.
-        self.commands = ["ssh", "ping", "traceroute", "batch ping", "details", "help", "exit"]
+        self.source_paths = inventory_paths(csv_path)
+        self.inventory_sources = None  # InventorySources when there are several files.
+        self.data = InventoryStore()            # All rows loaded from CSV.
+        self.filtered_data = array.array("I")   # Indices of the filtered rows, in display order.
+        self.commands = ["ssh", "ping", "traceroute", "batch ping", "monitor", "details", "settings", "help", "exit"]
         self.active_command_index = 0
         self.status_timer: Timer | None = None
         self.sort_column = None  # None means no sort has been applied yet.
         self.sort_ascending = True
+        self.search_text = ""  # Current (casefolded) search input.
+        self.search_stack = SearchStack()
+        self.search_debounce = SM_SEARCH_DEBOUNCE
+        self.search_timer: Timer | None = None
+        self.search_mode = SM_SEARCH_MODE
+        self.search_top_k = SM_SEARCH_TOP_K
+        self.ping_concurrency = SM_PING_CONCURRENCY
+        self.ping_timeout = SM_PING_TIMEOUT
+        self.ping_deadline = SM_PING_DEADLINE
+        self.sweep_rate = SM_SWEEP_RATE
+        self.batch_jobs = set()       # Running BatchJob instances.
+        self.child_processes = set()  # Ping children started by batch jobs.
+        self.monitor_interval = SM_MONITOR_INTERVAL
+        self.monitor_jitter = SM_MONITOR_JITTER
+        self.monitor_max_interval = SM_MONITOR_MAX_INTERVAL
+        self.inventory_version = 0  # Bumped whenever self.data is replaced.
+        self.monitor_worker: Worker | None = None
+        self.probe_cache = ProbeCache(SM_CACHE_TTL)  # Last PingResult per IP, shown in the status columns.
+        self.latency_history = LatencyHistory(SM_HISTORY_SIZE)
+        self.show_sparklines = SM_SPARKLINE_COLUMN
+        if SM_PING_ENGINE == "subprocess":
+            self.native_icmp = False
+        else:
+            self.native_icmp = native_icmp_available()
+            if SM_PING_ENGINE == "native" and not self.native_icmp:
+                logging.warning("SM_PING_ENGINE=native but ICMP sockets cannot be opened; using the ping binary")
     
     def compose(self) -> ComposeResult:
         logging.debug("Composing main SwitchManagerApp widgets")
@@ -218,13 +2748,18 @@ class SwitchManagerApp(App):
                     yield Static(cmd, id=f"cmd-{i}", classes=css_class)
             yield Input(placeholder="Search...", id="search_input")
             with Vertical(id="table_container"):
-                yield DataTable(id="data_table")
+                yield PagedDataTable(id="data_table")
             yield Static("", id="status", classes="status")
     
     def on_mount(self) -> None:
         logging.debug("SwitchManagerApp mounting: loading CSV and updating table")
+        self.update_table(self.filtered_data)
         self.load_csv()
-        self.update_table(self.data)
+        if SM_WATCH:
+            for path in self.source_paths:
+                self.run_worker(self.watch_inventory(path), group="watch", exit_on_error=False)
+        if SM_MONITOR:
+            self.start_monitor()
         try:
             table = self.query(DataTable).first()
         except NoMatches:
@@ -237,17 +2772,302 @@ class SwitchManagerApp(App):
             logging.debug("No DataTable found in on_mount")
     
     def load_csv(self) -> None:
+        """Load the CSV in a worker thread; rows appear in the table chunk by chunk."""
         logging.debug("Loading CSV data")
-        csv_file = Path(self.csv_path)
-        if csv_file.exists():
-            with csv_file.open("r", newline="", encoding="utf-8") as f:
-                reader = csv.DictReader(f, delimiter=SM_DELIMITER)
-                self.data = [{k.strip(): v for k, v in row.items()} for row in reader]
-            logging.debug(f"CSV loaded with {len(self.data)} rows")
-        else:
+        self.run_worker(self.read_csv_chunks, thread=True, group="load", exclusive=True, exit_on_error=False)
+    
+    def read_csv_chunks(self) -> None:
+        # Runs in a worker thread: parse chunks here, hand them to the event loop to store and display.
+        worker = get_current_worker()
+        started = time.perf_counter()
+        if len(self.source_paths) > 1:
+            if SM_BACKEND == "sqlite":
+                logging.warning("The SQLite backend takes a single CSV file; merging the sources in memory")
+            sources = InventorySources(self.source_paths, SM_DUPLICATES)
+            try:
+                store = sources.load()
+            except (OSError, ValueError, csv.Error) as e:
+                logging.warning(f"Could not load the inventory: {e}")
+                self.call_from_thread(self.show_status, f"Could not load the inventory: {e}")
+                return
+            if not worker.is_cancelled:
+                self.inventory_sources = sources
+                self.call_from_thread(self.add_csv_chunk, store, None, 1.0, started, True)
+            return
+        csv_file = self.source_paths[0]
+        if not csv_file.exists():
             logging.debug("CSV file does not exist; no data loaded")
-            self.data = []
-        self.filtered_data = self.data.copy()
+            self.call_from_thread(self.add_csv_chunk, InventoryStore(), None, 1.0, started, True)
+            return
+        if SM_BACKEND == "sqlite":
+            def on_progress(fraction: float, rows: int) -> None:
+                self.call_from_thread(self.show_status, f"Importing inventory: {fraction:.0%} ({rows} switches)", 60)
+            try:
+                store = SqliteInventory.open(csv_file, on_progress, lambda: worker.is_cancelled)
+            except (sqlite3.Error, OSError, ValueError) as e:
+                # E.g. an SQLite built without FTS5, a read-only directory or an unreadable CSV.
+                logging.warning(f"SQLite backend unavailable, loading {csv_file} into memory: {e}")
+            else:
+                if store is not None:
+                    self.call_from_thread(self.add_csv_chunk, store, None, 1.0, started, True)
+                return
+        if SM_SNAPSHOT:
+            store, stale = load_snapshot(csv_file)
+            if store is not None:
+                self.call_from_thread(self.add_csv_chunk, store, None, 1.0, started, True)
+                if stale:
+                    # Same contents under a new mtime: refresh the key so the next start skips hashing.
+                    write_snapshot(store, csv_file, csv_file.stat())
+                return
+        stat = csv_file.stat()
+        total_bytes = max(1, stat.st_size)
+        store = None
+        if parallel_parse(csv_file, stat):
+            try:
+                store = self.read_csv_parallel(worker, csv_file, total_bytes, started)
+            except (BrokenProcessPool, OSError) as e:
+                logging.warning(f"Parallel parse of {csv_file} failed, parsing it in one process: {e}")
+        if store is None:
+            try:
+                store = self.read_csv_serial(worker, csv_file, total_bytes, started)
+            except ValueError as e:
+                # E.g. zstd without the zstandard package, or not UTF-8.
+                logging.warning(f"Could not load {csv_file}: {e}")
+                self.call_from_thread(self.show_status, f"Could not load {csv_file.name}: {e}")
+                return
+        if SM_SNAPSHOT and not worker.is_cancelled:
+            write_snapshot(store, csv_file, stat)
+    
+    def read_csv_serial(self, worker: Worker, csv_file: Path, total_bytes: int, started: float) -> InventoryStore:
+        with open_csv(csv_file) as (f, raw):
+            reader = csv.reader(f, delimiter=SM_DELIMITER)
+            store, plan = new_inventory(next(reader, None))
+            chunk_size = LOAD_FIRST_CHUNK
+            while not worker.is_cancelled:
+                rows = list(itertools.islice(reader, chunk_size))
+                done = len(rows) < chunk_size
+                # call_from_thread waits for the UI to take the chunk, which throttles parsing.
+                self.call_from_thread(self.add_csv_chunk, store, functools.partial(store.extend, rows, plan),
+                                      raw.tell() / total_bytes, started, done)
+                if done:
+                    break
+                chunk_size = LOAD_CHUNK
+        return store
+    
+    def read_csv_parallel(self, worker: Worker, csv_file: Path, total_bytes: int, started: float) -> InventoryStore:
+        store, chunks = parallel_csv_chunks(csv_file, SM_LOAD_WORKERS)
+        logging.debug(f"Parsing {csv_file} with {SM_LOAD_WORKERS} processes")
+        with contextlib.closing(chunks):
+            for columns, end in chunks:
+                if worker.is_cancelled:
+                    return store
+                self.call_from_thread(self.add_csv_chunk, store, functools.partial(store.extend_parsed, columns),
+                                      end / total_bytes, started, False)
+        self.call_from_thread(self.add_csv_chunk, store, None, 1.0, started, True)
+        return store
+    
+    async def watch_inventory(self, path: Path) -> None:
+        async for _ in watch_file(path, SM_WATCH_INTERVAL):
+            logging.debug(f"{path} changed on disk, reloading")
+            if self.inventory_sources is None:
+                self.reload_csv()
+            else:
+                self.reload_source(path)
+    
+    def reload_csv(self) -> None:
+        """Re-read the CSV after it changed and apply only the differences."""
+        if self.inventory_version == 0:
+            self.load_csv()  # Still loading: start over with the new contents.
+            return
+        self.run_worker(self.read_csv_changes, thread=True, group="load", exclusive=True, exit_on_error=False)
+    
+    def reload_source(self, path: Path) -> None:
+        """Re-read one of several CSV files after it changed and apply only its differences."""
+        if self.inventory_version == 0:
+            self.load_csv()
+            return
+        self.run_worker(functools.partial(self.read_source_changes, path), thread=True,
+                        group=f"reload {path}", exclusive=True, exit_on_error=False)
+    
+    def read_source_changes(self, path: Path) -> None:
+        # Runs in a worker thread, like read_csv_changes, but for one of several sources.
+        worker = get_current_worker()
+        sources = self.inventory_sources
+        version = self.inventory_version
+        try:
+            prepared = sources.prepare_reload(path)
+            if prepared is None:
+                # The file brings new columns: merge all sources again (the others from their snapshots).
+                self.call_from_thread(self.apply_reload, sources.load(), None, version)
+                return
+        except (OSError, ValueError, csv.Error) as e:
+            logging.warning(f"Could not reload {path}: {e}")
+            self.call_from_thread(self.show_status, f"Could not reload {path.name}: {e}")
+            return
+        if not worker.is_cancelled:
+            self.call_from_thread(self.apply_source_reload, path, *prepared, version)
+    
+    def apply_source_reload(self, path: Path, new: InventoryStore, diff: tuple, version: int) -> None:
+        if version != self.inventory_version:
+            self.reload_source(path)  # The inventory changed since the diff was made.
+            return
+        self.inventory_version += 1
+        added, removed, changed = self.inventory_sources.apply(path, new, diff)
+        self.patch_view(added, removed, changed)
+        logging.debug(f"Reloaded {path}: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+        self.show_status(f"Reloaded {path.name}: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+    
+    def read_csv_changes(self) -> None:
+        # Runs in a worker thread: parse the new CSV and diff it against the inventory on screen.
+        worker = get_current_worker()
+        csv_file = self.source_paths[0]
+        version = self.inventory_version
+        try:
+            stat = csv_file.stat()
+            if isinstance(self.data, SqliteInventory):
+                new = SqliteInventory.open(csv_file, cancelled=lambda: worker.is_cancelled)
+            else:
+                new = parse_inventory(csv_file)
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            logging.warning(f"Could not reload {csv_file}: {e}")
+            self.call_from_thread(self.show_status, f"Could not reload {csv_file.name}: {e}")
+            return
+        if new is None or worker.is_cancelled:
+            return
+        diff = None
+        if isinstance(new, InventoryStore) and isinstance(self.data, InventoryStore) and new.fields == self.data.fields:
+            diff = self.data.diff(new)
+        self.call_from_thread(self.apply_reload, new, diff, version)
+        if SM_SNAPSHOT and isinstance(new, InventoryStore) and not worker.is_cancelled:
+            write_snapshot(new, csv_file, stat)
+    
+    def apply_reload(self, new, diff: tuple | None, version: int) -> None:
+        """Bring the inventory, the view and the table in line with a reloaded CSV."""
+        if version != self.inventory_version:
+            if isinstance(new, SqliteInventory):
+                new.close()
+            self.load_csv() if self.inventory_sources is not None else self.reload_csv()
+            return
+        self.inventory_version += 1
+        table = self.main_table()
+        if diff is None:
+            # A different schema or backend: replace the inventory, keeping search, sort and cursor row.
+            previous, self.data = self.data, new
+            self.search_stack.clear()
+            self.filtered_data = self.sort_rows(self.filter_rows())
+            cursor = table.cursor_row if table is not None else 0
+            self.update_table(self.filtered_data)
+            if table is not None:
+                table.load_more(cursor)
+                table.move_cursor(row=cursor)
+            if self.search_limit(self.search_text, new) is not None:
+                self.start_search()  # Ranked results: rank the new inventory.
+            self.index_inventory()
+            if isinstance(previous, SqliteInventory):
+                previous.close()  # Its file was replaced by the new database's.
+            self.show_status(f"Reloaded {self.data.live_count} switches")
+            return
+        _, removed, changed = diff
+        added = self.data.apply_diff(new, diff)
+        changed = [row for row, _ in changed]
+        self.patch_view(added, removed, changed)
+        logging.debug(f"Reloaded CSV: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+        self.show_status(f"Reloaded inventory: {len(added)} added, {len(removed)} removed, {len(changed)} changed")
+    
+    def patch_view(self, added, removed, changed) -> None:
+        """Update the filtered view and the table for rows that appeared, disappeared or changed."""
+        self.search_stack.clear()
+        if self.search_limit(self.search_text, self.data) is not None:
+            # Ranked results: rank afresh, the table is redrawn with them.
+            self.start_search()
+            self.index_inventory()
+            return
+        table = self.main_table()
+        # Changed rows may have started or stopped matching the search (or be hidden).
+        changed = [row for row in changed if row not in self.data.removed]
+        matching = set(self.filter_rows(changed))
+        dropped = set(removed).union(row for row in changed if row not in matching)
+        shown = set(self.filtered_data)
+        view = array.array("I", (row for row in self.filtered_data if row not in dropped))
+        view.extend(row for row in changed if row in matching and row not in shown)
+        view.extend(self.filter_rows(added))
+        self.filtered_data = self.sort_rows(view)
+        if table is not None:
+            table.sync_rows(self.filtered_data, {str(row) for row in changed})
+        self.index_inventory()
+    
+    def index_inventory(self) -> None:
+        """(Re)build the search index of the inventory in a worker thread, unless it is current enough."""
+        store = self.data
+        if not SM_SEARCH_INDEX or not isinstance(store, InventoryStore):
+            return
+        if store.search_index is not None and not store.search_index.outdated:
+            return
+        self.run_worker(functools.partial(self.build_search_index, store, self.inventory_version), thread=True,
+                        group="index", exclusive=True, exit_on_error=False)
+    
+    def build_search_index(self, store: InventoryStore, version: int) -> None:
+        # Runs in a worker thread; searches scan the inventory until the index is in place.
+        worker = get_current_worker()
+        started = time.perf_counter()
+        index = TrigramIndex(store)
+        if index.build(lambda: worker.is_cancelled):
+            logging.debug(f"Indexed {index.indexed} rows ({len(index.postings)} trigrams) "
+                          f"in {time.perf_counter() - started:.3f}s")
+            self.call_from_thread(self.attach_search_index, store, index, version)
+    
+    def attach_search_index(self, store: InventoryStore, index: TrigramIndex, version: int) -> None:
+        if store is not self.data:
+            return
+        if version != self.inventory_version:
+            self.index_inventory()  # Rows changed while indexing: start over.
+            return
+        store.search_index = index
+    
+    def add_csv_chunk(self, store: InventoryStore, extend, progress: float, started: float, done: bool) -> None:
+        """Take a loaded chunk into `store`, by calling extend() (if given) on the event loop."""
+        self.search_stack.clear()
+        if store is not self.data:
+            # First chunk of a (re)load: show it right away.
+            if extend is not None:
+                extend()
+            previous, self.data = self.data, store
+            ranked = self.search_limit(self.search_text, store) is not None
+            self.filtered_data = array.array("I") if ranked else self.sort_rows(self.filter_rows())
+            self.update_table(self.filtered_data)
+            if isinstance(previous, SqliteInventory):
+                previous.close()
+        elif self.search_limit(self.search_text, store) is not None:
+            if extend is not None:
+                extend()
+        else:
+            first = len(store)
+            if extend is not None:
+                extend()
+            # Extend the displayed view in place; the table picks new rows up as the cursor gets near.
+            # A sorted view is sorted once the load is done, rather than on every chunk.
+            self.filtered_data.extend(self.filter_rows(range(first, len(store))))
+            table = self.main_table()
+            if done and self.sort_column is not None:
+                self.filtered_data = self.sort_rows(self.filtered_data)
+                cursor = table.cursor_row if table is not None else 0
+                self.update_table(self.filtered_data)
+                if table is not None:
+                    table.load_more(cursor)
+                    table.move_cursor(row=cursor)
+            elif table is not None:
+                table.load_more()
+        if self.search_limit(self.search_text, store) is not None:
+            self.start_search()  # Ranked results: rank the rows loaded so far.
+        if done:
+            self.inventory_version += 1
+            self.index_inventory()
+            elapsed = time.perf_counter() - started
+            logging.debug(f"CSV loaded with {store.live_count} rows in {elapsed:.3f}s")
+            sources = f" from {len(self.source_paths)} files" if self.inventory_sources is not None else ""
+            self.show_status(f"Loaded {store.live_count} switches{sources} in {elapsed:.1f}s")
+        else:
+            self.show_status(f"Loading inventory: {progress:.0%} ({len(store)} switches)", duration=60)
     
     def update_table(self, rows) -> None:
         logging.debug(f"Updating table with {len(rows)} rows")
@@ -259,15 +3079,67 @@ class SwitchManagerApp(App):
             logging.debug("No DataTable found when updating table")
             return
         table.clear(columns=True)
-        table.add_columns("Name", "IP", "subnet", "Alias", "comment")
-        for row in rows:
-            table.add_row(
-                row.get("Name", row.get("name", "")),
-                row.get("IP", row.get("ip", "")),
-                row.get("subnet", row.get("Subnet", "")),
-                row.get("aliases", row.get("Alias", "")),
-                row.get("comment", row.get("Comment", ""))
-            )
+        for field, label in zip(TABLE_FIELDS, ("Name", "IP", "subnet", "Alias", "comment")):
+            table.add_column(label, key=field)
+        monitoring = self.monitor_worker is not None
+        if monitoring:
+            table.add_column("status", key="status")
+            table.add_column("RTT", key="rtt")
+        if self.show_sparklines:
+            table.add_column("history", key="history")
+        # Rows are keyed by their inventory index so status updates can find them.
+        table.show_rows(rows, self.table_cells, str)
+    
+    def table_cells(self, row: int) -> list:
+        columns = self.data.columns
+        cells = [columns[field][row] for field in TABLE_FIELDS]
+        ip = columns["ip"][row]
+        if self.monitor_worker is not None:
+            cells.extend(format_status(self.probe_cache.latest(ip)))
+        if self.show_sparklines:
+            cells.append(self.latency_history.sparkline(ip, SPARKLINE_COLUMN_WIDTH))
+        return cells
+    
+    @property
+    def cache_ttl(self) -> float:
+        return self.probe_cache.ttl
+    
+    @cache_ttl.setter
+    def cache_ttl(self, value: float) -> None:
+        self.probe_cache.ttl = value
+    
+    def main_table(self) -> DataTable | None:
+        """The inventory table of the main screen, even while a modal is on top."""
+        try:
+            return self.screen_stack[0].query_one("#data_table", DataTable)
+        except (NoMatches, IndexError):
+            return None
+    
+    def record_result(self, result: PingResult) -> None:
+        """Remember a probe result of a host and repaint its status cells if they changed."""
+        if not result.probed:
+            return  # Nothing was learnt about the host.
+        previous = self.probe_cache.latest(result.ip)
+        self.probe_cache.put(result)
+        self.latency_history.add(result.ip, result.rtt_avg if result.ok else None)
+        updates = {}
+        if self.monitor_worker is not None:
+            cells = format_status(result)
+            if previous is None or format_status(previous) != cells:
+                updates["status"], updates["rtt"] = cells
+        if self.show_sparklines:
+            updates["history"] = self.latency_history.sparkline(result.ip, SPARKLINE_COLUMN_WIDTH)
+        if not updates:
+            return
+        table = self.main_table()
+        if table is None:
+            return
+        for row in self.data.rows_with_ip(result.ip):
+            row_key = str(row)
+            if row_key not in table.rows:
+                continue  # Not materialized yet; it is formatted with the latest state when it is.
+            for column, value in updates.items():
+                table.update_cell(row_key, column, value)
     
     def sort_table(self, col_index: int) -> None:
         # Toggle sort order if the same column is sorted again.
@@ -278,9 +3150,23 @@ class SwitchManagerApp(App):
             self.sort_ascending = True
         
         logging.debug(f"Sorting table by column {col_index} in {'ascending' if self.sort_ascending else 'descending'} order")
-        self.filtered_data.sort(key=lambda row: get_value(row, col_index).lower(), reverse=not self.sort_ascending)
+        self.filtered_data = self.sort_rows(self.filtered_data)
         self.update_table(self.filtered_data)
     
+    def sort_rows(self, rows, store=None, text: str | None = None):
+        """rows of store (default the inventory) in the current sort order (unchanged if the table is not sorted).
+
+        text is the search the rows match, default the current one.
+        """
+        if self.sort_column is None:
+            return rows
+        store = self.data if store is None else store
+        field = TABLE_FIELDS[self.sort_column]
+        if isinstance(store, SqliteInventory):
+            return store.select(self.search_text if text is None else text, field, self.sort_ascending)
+        column = store.columns[field]
+        return array.array("I", sorted(rows, key=lambda row: column[row].lower(), reverse=not self.sort_ascending))
+    
     def action_prev_command(self) -> None:
         logging.debug("SwitchManagerApp: Moving to previous command")
         self.active_command_index = (self.active_command_index - 1) % len(self.commands)
@@ -322,32 +3208,212 @@ class SwitchManagerApp(App):
             logging.debug("SwitchManagerApp: Moving cursor down in DataTable")
             table.action_cursor_down()
     
-    async def run_ping(self, hostname: str, ip: str) -> str:
+    async def run_ping(self, hostname: str, ip: str, timeout: float | None = None) -> PingResult:
+        timeout = timeout or self.ping_timeout
+        if self.native_icmp:
+            try:
+                return await native_ping(hostname, ip, 1, timeout)
+            except OSError as e:
+                logging.error(f"Native ping of {ip} failed: {e}")
+                return PingResult.failed(hostname, ip, f"Error: {e}")
+        command = ["ping", "-c", "1"]
+        if sys.platform.startswith("linux"):
+            # Elsewhere -W takes milliseconds (or is missing); wait_for below bounds the wait anyway.
+            command += ["-W", str(max(1, math.ceil(timeout)))]
         proc = await asyncio.create_subprocess_exec(
-            "ping", "-c", "1", ip,
+            *command, ip,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await proc.communicate()
-        if stdout:
-            return f">> {hostname} ({ip}):\n" + stdout.decode()
-        else:
-            return f">> {hostname} ({ip}):\n" + stderr.decode()
+        self.child_processes.add(proc)
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            logging.debug(f"Ping of {ip} exceeded {timeout}s; killing child process")
+            proc.kill()
+            await proc.communicate()  # Drain the pipes and reap the child.
+            return PingResult.failed(hostname, ip, f"Timed out after {timeout:g}s")
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.communicate()
+            raise
+        finally:
+            self.child_processes.discard(proc)
+        return parse_ping_output(hostname, ip, stdout.decode() if stdout else stderr.decode(), proc.returncode)
     
     async def run_batch_ping(self) -> None:
         logging.debug("Running batch ping on filtered data")
-        loading_screen = OutputScreen("Running batch ping, please wait...")
-        await self.push_screen(loading_screen)
+        names, ips = self.data.columns["name"], self.data.columns["ip"]
+        targets = [(names[row], ips[row]) for row in self.filtered_data if ips[row]]
+        job = BatchJob("Batch ping", len(targets))
+        results_screen = PingResultsScreen(job)
+        await self.push_screen(results_screen)
+        # Run the sweep in the background so the UI keeps handling input while results stream in.
+        job.worker = self.run_worker(self.stream_batch_ping(job, results_screen, targets), group="batch_ping", exit_on_error=False)
+    
+    async def stream_batch_ping(self, job: BatchJob, results_screen: PingResultsScreen, targets: list) -> None:
+        pending = []
+        last_render = 0.0
+        loop = asyncio.get_running_loop()
+        
+        def render() -> None:
+            if not results_screen.is_attached:
+                return
+            state = "finished" if job.done == job.total else "running"
+            results_screen.update_header(
+                f"Batch ping {state}: {job.done}/{job.total} done ({cached} cached), {job.failed} failed"
+                " - F1-F9 to sort, ESC to close")
+            results_screen.add_results(pending)
+            pending.clear()
+        
+        def on_result(index: int, result: PingResult) -> None:
+            nonlocal last_render
+            pending.append(result)
+            # Repaint at most every BATCH_RENDER_INTERVAL so thousands of replies do not flood the UI.
+            if loop.time() - last_render >= BATCH_RENDER_INTERVAL:
+                last_render = loop.time()
+                render()
         
-        tasks = []
-        for row in self.filtered_data:
-            ip = row.get("IP", "").strip()
-            hostname = row.get("Name", row.get("name", ""))
-            if ip:
-                tasks.append(asyncio.create_task(self.run_ping(hostname, ip)))
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        combined_output = "\n\n".join(str(result) for result in results)
-        loading_screen.update_output(combined_output)
+        # Serve hosts probed within the cache TTL right away and only probe the rest.
+        cached = 0
+        stale = []
+        for hostname, ip in targets:
+            result = self.probe_cache.get(ip)
+            if result is None:
+                stale.append((hostname, ip))
+                continue
+            cached += 1
+            job.done += 1
+            if not result.ok:
+                job.failed += 1
+            pending.append(dataclasses.replace(result, hostname=hostname))
+        logging.debug(f"Batch ping served {cached} results from cache; probing {len(stale)} hosts")
+        render()
+        await self.probe_targets(job, stale, on_result)
+        logging.debug(f"Batch ping finished: {job.done}/{job.total} done, {job.failed} failed")
+        render()
+    
+    async def probe_targets(self, job: BatchJob, targets: list, on_result=None) -> list:
+        """Probe (hostname, ip) targets with the best available engine, accounting progress on the job."""
+        
+        def record(index: int, result: PingResult) -> None:
+            job.done += 1
+            if not result.ok:
+                job.failed += 1
+            self.record_result(result)
+            if on_result:
+                on_result(index, result)
+        
+        self.batch_jobs.add(job)
+        try:
+            if self.native_icmp and SM_BATCH_PING_MODE == "sweep":
+                logging.debug(f"Sweeping {len(targets)} targets from a single ICMP socket at {self.sweep_rate}/s")
+                return await icmp_sweep(targets, self.ping_timeout, self.sweep_rate, self.ping_deadline, record)
+            scheduler = BatchPingScheduler(
+                self.run_ping,
+                concurrency=self.ping_concurrency,
+                timeout=self.ping_timeout,
+                deadline=self.ping_deadline,
+            )
+            return await scheduler.run(targets, record)
+        finally:
+            self.batch_jobs.discard(job)
+            job.finished.set()
+    
+    def start_monitor(self) -> None:
+        logging.debug("Starting background reachability monitor")
+        self.monitor_worker = self.run_worker(self.monitor_loop(), group="monitor", exit_on_error=False)
+    
+    def stop_monitor(self) -> None:
+        logging.debug("Stopping background reachability monitor")
+        if self.monitor_worker is not None:
+            self.monitor_worker.cancel()
+        self.monitor_worker = None
+    
+    def monitor_targets(self) -> dict:
+        """Unique IPs of the inventory mapped to the name of their first row."""
+        targets = {}
+        names, ips = self.data.columns["name"], self.data.columns["ip"]
+        for row in self.data.live_rows():
+            ip = ips[row]
+            if ip and ip not in targets:
+                targets[ip] = names[row]
+        return targets
+    
+    async def monitor_loop(self) -> None:
+        """Probe hosts as the adaptive scheduler makes them due, batching hosts that fall due together."""
+        loop = asyncio.get_running_loop()
+        scheduler = AdaptiveProbeScheduler(self.monitor_interval, self.monitor_max_interval, self.monitor_jitter)
+        synced_version = None
+        while True:
+            # Pick up settings changes and inventory reloads.
+            scheduler.min_interval = self.monitor_interval
+            scheduler.max_interval = max(self.monitor_interval, self.monitor_max_interval)
+            scheduler.jitter = self.monitor_jitter
+            if synced_version != self.inventory_version:
+                scheduler.sync(self.monitor_targets(), loop.time())
+                synced_version = self.inventory_version
+            due = []
+            for hostname, ip in scheduler.due(loop.time()):
+                # A fresh answer from another command (e.g. batch ping) makes this probe unnecessary.
+                result = self.probe_cache.get(ip)
+                if result is None:
+                    due.append((hostname, ip))
+                else:
+                    scheduler.report(result, loop.time())
+            if due:
+                job = BatchJob("Monitor sweep", len(due))
+                job.worker = self.monitor_worker
+                await self.probe_targets(job, due, lambda index, result: scheduler.report(result, loop.time()))
+                logging.debug(f"Monitor probed {job.total} due hosts, {job.failed} down")
+            next_due = scheduler.next_due()
+            delay = self.monitor_interval if next_due is None else next_due - loop.time()
+            await asyncio.sleep(max(MONITOR_TICK, delay))
+    
+    def format_details(self, details: str, ip: str, result: PingResult | None) -> str:
+        if result is None:
+            status = "probing..." if ip else "no IP"
+        else:
+            state, rtt = format_status(result)
+            status = f"{state}, {rtt}" if rtt else state
+            status += f" (probed {self.probe_cache.age(ip) or 0.0:.0f}s ago)"
+        return (f"{details}\nstatus: {status}\nlatency: {self.latency_history.describe(ip)}"
+                f"\n\nresult cache: {self.probe_cache.stats()}")
+    
+    async def refresh_details(self, details_screen: OutputScreen, details: str, hostname: str, ip: str) -> None:
+        """Probe a host whose cached result is stale and show the answer on its details screen."""
+        self.record_result(await self.run_ping(hostname, ip))
+        if details_screen.is_attached:
+            details_screen.update_output(self.format_details(details, ip, self.probe_cache.latest(ip)))
+    
+    def show_status(self, message: str, duration: float = 5.0) -> None:
+        """Show a message in the status bar of the main screen for a few seconds."""
+        try:
+            status = self.screen_stack[0].query_one("#status", Static)
+        except (NoMatches, IndexError):
+            logging.debug(f"No status bar to show message: {message}")
+            return
+        status.update(message)
+        if self.status_timer:
+            self.status_timer.stop()
+        self.status_timer = self.set_timer(duration, lambda: status.update(""))
+    
+    async def cancel_batch_jobs(self) -> None:
+        """Cancel every running batch job and kill any ping children that survived."""
+        abandoned = 0
+        for job in list(self.batch_jobs):
+            abandoned += await job.cancel()
+        for proc in list(self.child_processes):
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+        self.child_processes.clear()
+        if abandoned:
+            logging.info(f"Abandoned {abandoned} probes of running batch jobs")
+    
+    async def on_unmount(self) -> None:
+        logging.debug("SwitchManagerApp unmounting, cancelling batch jobs")
+        await self.cancel_batch_jobs()
     
     async def action_execute_command(self) -> None:
         try:
@@ -361,8 +3427,8 @@ class SwitchManagerApp(App):
         if row_index >= len(self.filtered_data):
             logging.debug("Cursor row index out of range; aborting command execution")
             return
-        row_data = self.filtered_data[row_index]
-        ip = row_data.get("IP", "").strip()
+        row_data = self.data.record(self.filtered_data[row_index])
+        ip = row_data.ip
         command = self.commands[self.active_command_index]
         logging.debug(f"Executing command '{command}' on IP: {ip} (row index {row_index})")
         
@@ -373,18 +3439,40 @@ class SwitchManagerApp(App):
             logging.debug(f"SSH command received; launching external SSH terminal for {ip}")
             launch_external_ssh(ip)
         elif command == "ping":
-            logging.debug(f"Ping command received; pushing StreamingOutputScreen for {ip}")
-            await self.push_screen(StreamingOutputScreen(["ping", "-c", "4", ip]))
+            if self.native_icmp:
+                logging.debug(f"Ping command received; pushing IcmpPingScreen for {ip}")
+                await self.push_screen(IcmpPingScreen(row_data.name, ip, timeout=self.ping_timeout))
+            else:
+                logging.debug(f"Ping command received; pushing StreamingOutputScreen for {ip}")
+                await self.push_screen(StreamingOutputScreen(["ping", "-c", "4", ip]))
         elif command == "traceroute":
             logging.debug(f"Traceroute command received; pushing StreamingOutputScreen for {ip}")
             await self.push_screen(StreamingOutputScreen(["traceroute", ip]))
         elif command == "batch ping":
             logging.debug("Batch ping command received; running batch ping")
             await self.run_batch_ping()
+        elif command == "monitor":
+            if self.monitor_worker is None:
+                self.start_monitor()
+                self.show_status(
+                    f"Monitoring {self.data.live_count} switches every {self.monitor_interval:g}s, "
+                    f"stable ones backing off to {self.monitor_max_interval:g}s")
+            else:
+                self.stop_monitor()
+                self.show_status("Monitoring stopped")
+            self.update_table(self.filtered_data)
         elif command == "details":
             details = "\n".join([f"{k}: {v}" for k, v in row_data.items()])
+            cached = self.probe_cache.get(ip) if ip else None
             logging.debug("Details command received; pushing OutputScreen")
-            await self.push_screen(OutputScreen(details))
+            details_screen = OutputScreen(self.format_details(details, ip, cached))
+            await self.push_screen(details_screen)
+            if ip and cached is None:
+                self.run_worker(self.refresh_details(details_screen, details, row_data.name, ip),
+                                group="details", exclusive=True, exit_on_error=False)
+        elif command == "settings":
+            logging.debug("Settings command received; pushing SettingsScreen")
+            await self.push_screen(SettingsScreen())
         elif command == "help":
             help_text = (
                 r" ____   ____        .____    .__ "+"\n"
@@ -400,13 +3488,18 @@ class SwitchManagerApp(App):
                 " - Press ENTER to execute the selected command.\n"
                 " - Use the search input to filter the table rows.\n"
                 " - You can search for multiple tokens by splitting them with whitespace.\n"
+                " - Use field=value (e.g. type=core) to match subnet, comment, type, responsible or aix_server exactly.\n"
                 " - Batch operations will be applied to all items in the data table.\n"
+                " - Select the Monitor command to toggle background reachability checks.\n"
                 " - Press the F* keys on your keyboard to change the sort column.\n"
+                " - Select the Settings command to tune batch ping concurrency and timeouts.\n"
                 " - Select the Help command to view this information.\n"
                 " - In any modal, press ESC to close it.\n\n"
                 " For feature requests or bug reports, please contact the developer.\n\n"
                 " ¬ Created by Franz, 2025"
             )
+            summary = ", ".join(f"{value or '-'} {count}" for value, count in self.data.value_counts("type")[:8])
+            help_text += f"\n\n Inventory: {self.data.live_count} switches by type: {summary}"
             logging.debug("Help command received; showing help screen")
             await self.push_screen(OutputScreen(help_text))
     
@@ -459,25 +3552,126 @@ class SwitchManagerApp(App):
     
     def on_input_changed(self, event: Input.Changed) -> None:
         logging.debug(f"Search input changed: {event.value}")
-        search_text = event.value.lower().strip()
-        if search_text == "":
-            self.filtered_data = self.data.copy()
+        self.search_text = event.value.casefold().strip()
+        # Search once typing pauses: every keystroke restarts the wait.
+        if self.search_timer is not None:
+            self.search_timer.stop()
+            self.search_timer = None
+        if self.search_debounce > 0:
+            self.search_timer = self.set_timer(self.search_debounce, self.start_search)
         else:
-            tokens = search_text.split()
-            self.filtered_data = [
-                row for row in self.data
-                if any(
-                    token in row.get("Name", row.get("name", "")).lower() or
-                    token in row.get("IP", row.get("ip", "")).lower() or
-                    token in row.get("subnet", row.get("Subnet", "")).lower() or
-                    token in row.get("aliases", row.get("Alias", "")).lower() or
-                    token in row.get("comment", row.get("Comment", "")).lower()
-                    for token in tokens
-                )
-            ]
+            self.start_search()
+    
+    def start_search(self) -> None:
+        """Search for the current text in a worker thread, cancelling any search still running."""
+        self.search_timer = None
+        search = functools.partial(self.search_inventory, self.search_text, self.data, self.inventory_version,
+                                   self.search_stack.generation)
+        self.run_worker(search, thread=True, group="search", exclusive=True, exit_on_error=False)
+    
+    def refresh_search(self) -> None:
+        """Search for the current text afresh, e.g. after the search mode changed."""
+        if self.search_timer is not None:
+            self.search_timer.stop()
+        self.search_stack.clear()
+        self.start_search()
+    
+    def search_limit(self, text: str, store) -> int | None:
+        """How many of the best fuzzy matches of a search text to show; None to show all matches."""
+        if self.search_mode != "fuzzy" or not isinstance(store, InventoryStore):
+            return None
+        _, tokens = parse_search(text, store.columns)
+        return self.search_top_k if tokens else None
+    
+    def search_inventory(self, text: str, store, version: int, generation: int) -> None:
+        # Runs in a worker thread; results are only shown if no newer search or inventory change came up.
+        worker = get_current_worker()
+        count = len(store)
+        sort = (self.sort_column, self.sort_ascending)
+        limit = self.search_limit(text, store)
+        matches = self.search_rows(text, store, lambda: worker.is_cancelled, generation)
+        if matches is None or worker.is_cancelled:
+            return
+        rows = matches
+        if limit is not None:
+            _, tokens = parse_search(text, store.columns)
+            rows = store.rank_fuzzy(tokens, matches, limit, lambda: worker.is_cancelled)
+            if rows is None:
+                return
+        rows = self.sort_rows(rows, store, text)
+        if not worker.is_cancelled:
+            self.call_from_thread(self.show_search_results, text, store, version, count, sort, limit, matches, rows)
+    
+    def show_search_results(self, text: str, store, version: int, count: int, sort: tuple, limit: int | None,
+                            matches, rows) -> None:
+        """Show the rows a search worker found, unless they are out of date by now."""
+        if text != self.search_text:
+            return  # A newer search is on its way.
+        if store is not self.data or version != self.inventory_version or limit != self.search_limit(text, store):
+            self.start_search()
+            return
+        if len(store) != count:
+            if limit is not None:
+                self.start_search()  # Rows were loaded meanwhile: rank them all again.
+                return
+            # Rows were loaded meanwhile: match them here (matches ascend, some of them may be included already).
+            matches = matches[:bisect.bisect_left(matches, count)]
+            matches.extend(self.filter_rows(range(count, len(store))))
+            rows = self.sort_rows(matches)
+        elif sort != (self.sort_column, self.sort_ascending):
+            rows = self.sort_rows(matches if limit is None else rows)
+        self.filtered_data = rows
         logging.debug(f"{len(self.filtered_data)} rows match search text")
         self.update_table(self.filtered_data)
     
+    def search_rows(self, text: str, store, cancelled=None, generation=None) -> array.array | None:
+        """Rows of store matching a search text, narrowing the previous results where possible."""
+        if isinstance(store, SqliteInventory):
+            return store.select(text)
+        fuzzy = self.search_mode == "fuzzy"
+        return self.search_stack.results(
+            text, store.columns, lambda search, rows: self.match_rows(search, rows, cancelled, store, fuzzy),
+            generation, fuzzy)
+    
+    def filter_rows(self, rows=None) -> array.array:
+        """Rows (of `rows`, default all) matching the current search text."""
+        if isinstance(self.data, SqliteInventory):
+            return self.data.select(self.search_text)  # Sorted by sort_rows, also a query.
+        if self.search_text == "":
+            return array.array("I", self.data.live_rows() if rows is None else rows)
+        return self.match_rows(parse_search(self.search_text, self.data.columns), rows,
+                               fuzzy=self.search_mode == "fuzzy")
+    
+    def match_rows(self, search: tuple, rows=None, cancelled=None, store=None,
+                   fuzzy: bool = False) -> array.array | None:
+        """Rows (of `rows`, default all live ones) of store (default the inventory) matching a parsed search.
+
+        Substring searches match rows containing any token, fuzzy ones rows matching
+        every token. Returns None if cancelled() turns true along the way.
+        """
+        store = self.data if store is None else store
+        filters, tokens = search
+        for field, value in filters:
+            rows = store.rows_where(field, value, rows)
+        # The trigram index only knows substrings.
+        index = None if fuzzy else store.search_index
+        candidates = index.candidates(tokens) if tokens and index is not None else None
+        if candidates is not None and (rows is None or len(rows) > len(candidates)):
+            # Only rows whose trigrams include every trigram of a token can match it.
+            if rows is None:
+                removed = store.removed
+                rows = [row for row in candidates if row not in removed]
+            else:
+                wanted = set(rows)
+                rows = [row for row in candidates if row in wanted]
+        if rows is None:
+            rows = store.live_rows()
+        if not tokens:
+            return array.array("I", rows)
+        if fuzzy:
+            return store.rows_fuzzy(tokens, rows, cancelled)
+        return store.rows_containing(tokens, rows, cancelled)
+    
     async def pop_screen(self) -> None:
         logging.debug("SwitchManagerApp popping screen (modal closed)")
         await super().pop_screen()